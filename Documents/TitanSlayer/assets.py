@@ -0,0 +1,128 @@
+# Titan Slayer
+# Sounds and textures, each loaded once and shared by the whole game
+
+import os
+import threading
+from collections import OrderedDict
+
+# Sounds the game plays, by the names the simulation uses
+GAME_SOUNDS = {
+    # SOURCE: Super Mario Bros.
+    "coin": "sounds/smb_coin.wav",
+    "jump": "sounds/smb_jump-small.wav",
+    "gun": "sounds/gunget.wav",
+    "game_over": "sounds/smb3_player_down.wav",
+    "strength": "sounds/smb3_power-up.wav",
+    "health": "sounds/smw2_1-up.wav",
+    "pew": "sounds/ssbm_peach_05.wav",
+    "attack": "sounds/ssbm_peach_04.wav",
+    "ow": "sounds/ssbm_peach_16.wav",
+    "next_level": "sounds/smb2_bonus_chance_start.wav",
+    "boss": "sounds/smb2_bonus_chance_win.wav",
+    # SOURCE: Minecraft
+    "fire": "sounds/fire.ogg",
+    "door": "sounds/open2.ogg",
+    "titan_hurt": "sounds/hurt3.ogg",
+    "titan_death": "sounds/death2.ogg",
+    "police_hurt": "sounds/hurt4.ogg",
+    "police_death": "sounds/death5.ogg",
+    # SOURCE: zatplat.com
+    "win": "sounds/win.mp3",
+}
+
+# Most sounds and textures kept loaded at once
+ASSET_CACHE_SIZE = 128
+
+# Assets folder, so the game finds its files from any working directory
+ASSET_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Tileset
+# Tile ID -> (x, y) of its cell in sprites/spritesheet.png
+TILE_CELLS = {
+    1: (64, 512),
+    2: (64, 448),
+    3: (0, 512),
+    4: (128, 512),
+    5: (0, 448),
+    6: (128, 448),
+    7: (64, 256),
+    8: (128, 576),
+    9: (128, 256),
+    10: (192, 448),
+    11: (192, 256),
+    12: (128, 640),
+}
+# The closed door sits on top of tile 8 until the level is cleared
+DOOR_CELL = (192, 640)
+
+
+class AssetManager:
+    """
+    Loads each sound and texture once for the whole game and keeps the most
+    recently used ones in a bounded cache. A manifest of assets can be
+    loaded on a background thread ahead of time. The loaders are passed in,
+    so the cache can be used and timed without a window.
+    """
+    def __init__(self, load_texture, load_sound, capacity=ASSET_CACHE_SIZE):
+        self.load_texture = load_texture
+        self.load_sound = load_sound
+        self.capacity = capacity
+        self.cache = OrderedDict()
+        self.paths = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.preload_thread = None
+
+    def resolve(self, filename):
+        """ Turns a path relative to the game folder into a full path, once """
+        path = self.paths.get(filename)
+        if path is None:
+            path = os.path.join(ASSET_DIR, filename)
+            self.paths[filename] = path
+        return path
+
+    def get(self, key, load):
+        """ Returns the cached asset for key, loading it if it isn't cached """
+        with self.lock:
+            if key in self.cache:
+                self.hits += 1
+                self.cache.move_to_end(key)
+                return self.cache[key]
+
+        # Load outside the lock so the other thread isn't held up
+        asset = load()
+        with self.lock:
+            self.misses += 1
+            self.cache[key] = asset
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.capacity:
+                self.cache.popitem(last=False)
+        return asset
+
+    def texture(self, filename, x=0, y=0, width=0, height=0):
+        path = self.resolve(filename)
+        return self.get(("texture", path, x, y, width, height),
+                        lambda: self.load_texture(path, x = x, y = y, width = width, height = height))
+
+    def sound(self, filename):
+        path = self.resolve(filename)
+        return self.get(("sound", path), lambda: self.load_sound(path))
+
+    def preload(self, manifest):
+        """
+        Loads a list of ("sound", filename) and ("texture", filename, x, y,
+        width, height) entries on a background thread.
+        """
+        if self.preload_thread is not None and self.preload_thread.is_alive():
+            return
+
+        def load_all():
+            for entry in manifest:
+                if entry[0] == "sound":
+                    self.sound(entry[1])
+                else:
+                    self.texture(*entry[1:])
+
+        self.preload_thread = threading.Thread(target=load_all, daemon=True)
+        self.preload_thread.start()
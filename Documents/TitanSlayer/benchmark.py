@@ -0,0 +1,590 @@
+# Titan Slayer
+# Benchmarks, run headless
+
+import argparse
+import gc
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import PIL.Image
+
+from assets import ASSET_DIR, DOOR_CELL, GAME_SOUNDS, TILE_CELLS, AssetManager
+from levels import LEVEL_MAPS, LEVEL_SPAWNS, compile_map, load_map, map_cells, open_map_stream
+from simulation import (ENEMY_HASH_CELL_SIZE, GAME_SETTINGS, GRAVITY, LEVEL_LIST_NAMES, SCALED_TILE_SIZE, SCREEN_HEIGHT,
+                        SCREEN_WIDTH, STREAM_WINDOW, TICK_LENGTH, TILE_SIZE, DynamicHash, Enemy, Entity,
+                        GameSimulation, GridPhysicsEngine, PhysicsEnginePlatformer, build_scene, build_streamed_scene,
+                        check_for_collision_with_list)
+
+BULLET_COUNTS = [10, 50, 100, 200, 400, 800]
+
+SUITE_TICKS = 1200
+LOAD_REPEATS = 5
+# Stress runs add this many titans, police and enemy bullets each
+STRESS_COUNT = 500
+# A timing more than this much slower than the baseline is a regression
+REGRESSION_THRESHOLD = 0.2
+
+
+def spray_bullets(simulation, count, seed=0):
+    """ Scatters bullets at random angles across the level """
+    rng = random.Random(seed)
+    bullets = []
+    for i in range(count):
+        bullet = Entity("sprites/bullet.png", 0.5)
+        bullet.center_x = rng.uniform(0, 68 * 64)
+        bullet.center_y = rng.uniform(-16 * 64, 7 * 64)
+        bullet.angle = rng.uniform(-180, 180)
+        bullets.append(bullet)
+    return bullets
+
+
+def time_frames(check, bullets, frames):
+    """ Returns the mean seconds per frame spent checking every bullet """
+    start = time.perf_counter()
+    for frame in range(frames):
+        for bullet in bullets:
+            check(bullet)
+    return (time.perf_counter() - start) / frames
+
+
+def bench_wall_collisions(level=1, frames=20):
+    """ Compares projectile-vs-wall checks against the wall list and the wall hash """
+    simulation = GameSimulation(level)
+    print(f"Level {level}: {len(simulation.wall_list)} walls")
+    print(f"{'bullets':>8} {'list ms/frame':>14} {'hash ms/frame':>14} {'hash us/bullet':>15}")
+    for count in BULLET_COUNTS:
+        bullets = spray_bullets(simulation, count)
+
+        # Both ways must find the same walls
+        for bullet in bullets:
+            by_list = check_for_collision_with_list(bullet, simulation.wall_list)
+            by_hash = simulation.wall_hash.get_collisions(bullet)
+            assert sorted(map(id, by_list)) == sorted(map(id, by_hash))
+
+        list_time = time_frames(lambda bullet: check_for_collision_with_list(bullet, simulation.wall_list),
+                                bullets, frames)
+        hash_time = time_frames(simulation.wall_hash.get_collisions, bullets, frames)
+        print(f"{count:>8} {list_time * 1000:>14.3f} {hash_time * 1000:>14.3f} {hash_time / count * 1e6:>15.2f}")
+
+
+def bench_projectile_pools(level=5, ticks=3000):
+    """
+    Shoots every frame, then attacks every few frames, and reports how often
+    the pools were hit. Shooting resets the attack cooldown, so the two
+    don't overlap.
+    """
+    simulation = GameSimulation(level)
+    simulation.bullet_amount = ticks
+    simulation.lives = ticks
+    rng = random.Random(0)
+    for tick in range(ticks):
+        target_x = simulation.player.center_x + rng.uniform(-400, 400)
+        target_y = simulation.player.center_y + rng.uniform(-300, 300)
+        if tick < ticks // 2:
+            inputs = [("mouse_press", target_x, target_y, "right")]
+        elif tick % 10 == 0:
+            inputs = [("mouse_press", target_x, target_y, "left")]
+        else:
+            inputs = []
+        simulation.step(inputs, 1 / 60)
+    print(f"Level {level}, {ticks} frames of heavy fire")
+    print(f"{'pool':>13} {'hits':>6} {'misses':>7} {'free':>5}")
+    for name, (hits, misses, free) in simulation.pool_stats().items():
+        print(f"{name:>13} {hits:>6} {misses:>7} {free:>5}")
+
+
+def crowd_level(simulation, count, seed=0, columns=60):
+    """ Adds count titans, count police and count enemy bullets across the level """
+    rng = random.Random(seed)
+    for i in range(count):
+        titan = Enemy("sprites/titan.png", 1)
+        titan.attributes(rng.uniform(5, columns), -7, 1, rng.uniform(1, 4), 6)
+        simulation.titan_list.append(titan)
+        police = Enemy("sprites/police.png", 1)
+        police.attributes(rng.uniform(5, columns), -7.6, 2, rng.uniform(1, 4), 6)
+        simulation.police_list.append(police)
+    for bullet in spray_bullets(simulation, count, seed):
+        bullet.change_x = rng.uniform(-5, 5)
+        bullet.change_y = rng.uniform(-5, 5)
+        simulation.enemy_bullet_list.append(bullet)
+
+
+def scalar_enemy_update(simulation):
+    """ The enemy part of GameSimulation.update, one entity at a time """
+    simulation.titan_list.update()
+    simulation.bullet_list.update()
+    simulation.police_list.update()
+    simulation.enemy_bullet_list.update()
+    for titan in simulation.titan_list:
+        titan.enemy_update()
+    for police in simulation.police_list:
+        police.enemy_update()
+
+
+def bench_entity_store(frames=100):
+    """ Times enemy movement, patrols and aiming with and without the NumPy store """
+    print(f"{'entities':>9} {'scalar ms/frame':>16} {'numpy ms/frame':>15}")
+    for count in [100, 1000, 5000]:
+        times = []
+        for vectorized in (False, True):
+            simulation = GameSimulation(1, vectorized=vectorized)
+            crowd_level(simulation, count)
+            start = time.perf_counter()
+            for frame in range(frames):
+                if vectorized:
+                    simulation.vectorized.update()
+                else:
+                    scalar_enemy_update(simulation)
+            times.append((time.perf_counter() - start) / frames)
+        print(f"{count * 3:>9} {times[0] * 1000:>16.3f} {times[1] * 1000:>15.3f}")
+
+
+def bench_enemy_broadphase(frames=20):
+    """
+    Compares finding the enemies each projectile hits by scanning both enemy
+    lists against one query of a hash rebuilt every frame
+    """
+    print(f"{'enemies':>8} {'projectiles':>12} {'scan ms/frame':>14} {'hash ms/frame':>14}")
+    for count in [50, 200, 800]:
+        simulation = GameSimulation(1)
+        crowd_level(simulation, count)
+        projectiles = spray_bullets(simulation, count, seed=1)
+        enemy_hash = DynamicHash(ENEMY_HASH_CELL_SIZE)
+
+        # Both ways must find the same enemies
+        enemy_hash.rebuild([("titan", simulation.titan_list), ("police", simulation.police_list)])
+        for projectile in projectiles:
+            hits = enemy_hash.get_hits(projectile)
+            assert sorted(map(id, hits["titan"])) == sorted(map(id, check_for_collision_with_list(projectile, simulation.titan_list)))
+            assert sorted(map(id, hits["police"])) == sorted(map(id, check_for_collision_with_list(projectile, simulation.police_list)))
+
+        start = time.perf_counter()
+        for frame in range(frames):
+            for projectile in projectiles:
+                check_for_collision_with_list(projectile, simulation.titan_list)
+                check_for_collision_with_list(projectile, simulation.police_list)
+        scan_time = (time.perf_counter() - start) / frames
+
+        start = time.perf_counter()
+        for frame in range(frames):
+            enemy_hash.rebuild([("titan", simulation.titan_list), ("police", simulation.police_list)])
+            for projectile in projectiles:
+                enemy_hash.get_hits(projectile)
+        hash_time = (time.perf_counter() - start) / frames
+        enemies = len(simulation.titan_list) + len(simulation.police_list)
+        print(f"{enemies:>8} {count:>12} {scan_time * 1000:>14.3f} {hash_time * 1000:>14.3f}")
+
+
+def wide_scene(copies, level=1):
+    """ Builds a scene with the level's map repeated side by side """
+    map_array = [list(map_row) * copies for map_row in load_map(LEVEL_MAPS[level])]
+    return build_scene(level, map_array, [])
+
+
+def bench_physics(frames=300):
+    """ Times the player's physics against the wall list and the tile grid as levels widen """
+    print(f"{'columns':>8} {'walls':>7} {'list us/frame':>14} {'grid us/frame':>14}")
+    for copies in [1, 4, 16, 64]:
+        scene = wide_scene(copies)
+        times = []
+        positions = []
+        for engine_class, walls in ((PhysicsEnginePlatformer, scene.wall_list), (GridPhysicsEngine, scene.wall_grid)):
+            player = Entity("player")
+            player.center_x = 4 * SCALED_TILE_SIZE
+            player.center_y = -7 * SCALED_TILE_SIZE
+            engine = engine_class(player, walls, gravity_constant=GRAVITY)
+            start = time.perf_counter()
+            for frame in range(frames):
+                player.change_x = 4
+                if frame % 40 == 0 and engine.can_jump():
+                    player.change_y = 8
+                engine.update()
+            times.append((time.perf_counter() - start) / frames)
+            positions.append((player.center_x, player.center_y))
+
+        # Both engines must move the player the same way
+        assert positions[0] == positions[1]
+        print(f"{scene.wall_grid.columns:>8} {len(scene.wall_list):>7} {times[0] * 1e6:>14.1f} {times[1] * 1e6:>14.1f}")
+
+
+def bench_activation(frames=100):
+    """
+    Times whole frames of a wide, crowded level with every enemy awake and
+    with enemies far from the viewport asleep
+    """
+    print(f"{'columns':>8} {'enemies':>8} {'awake':>6} {'asleep':>7} {'all awake ms':>13} {'sleeping ms':>12}")
+    for copies in [1, 4, 16]:
+        times = []
+        for activation_distance in (None, SCREEN_WIDTH):
+            simulation = GameSimulation(1, grid_physics=True, activation_distance=activation_distance)
+            simulation.lives = frames * 10
+            simulation.set_scene(wide_scene(copies))
+            crowd_level(simulation, 50 * copies, columns=copies * 68 - 8)
+            start = time.perf_counter()
+            for frame in range(frames):
+                simulation.step([], 1 / 60)
+            times.append((time.perf_counter() - start) / frames)
+        active, dormant = simulation.enemy_activity()
+        print(f"{copies * 68:>8} {active + dormant:>8} {active:>6} {dormant:>7} {times[0] * 1000:>13.2f} {times[1] * 1000:>12.2f}")
+
+
+def scene_entities(scene):
+    return sum(len(getattr(scene, list_name)) for list_name in LEVEL_LIST_NAMES)
+
+
+def bench_streaming(level=1):
+    """
+    Builds wide levels whole and streamed, then sweeps the viewport across
+    the streamed one, timing the chunks it loads and drops on the way
+    """
+    print(f"{'columns':>8} {'whole ms':>9} {'whole MB':>9} {'entities':>9} "
+          f"{'stream ms':>10} {'stream MB':>10} {'entities':>9} {'chunk ms':>9}")
+    map_array = load_map(LEVEL_MAPS[level])
+    columns = len(map_array[0])
+    with tempfile.TemporaryDirectory() as folder:
+        for copies in [16, 64, 256]:
+            wide_array = [list(map_row) * copies for map_row in map_array]
+            spawns = [spawn[:3] + (spawn[3] + copy * columns,) + spawn[4:]
+                      for copy in range(copies) for spawn in LEVEL_SPAWNS[level]]
+            filename = os.path.join(folder, f"wide_{copies}.csv")
+            with open(filename, "w") as map_file:
+                for map_row in wide_array:
+                    map_file.write(",".join(str(item) for item in map_row) + "\n")
+            compile_map(filename)
+
+            # Times first, then memory, which tracing slows down
+            results = []
+            for build in (lambda: build_scene(level, wide_array, spawns),
+                          lambda: build_streamed_scene(level, open_map_stream(filename), spawns, STREAM_WINDOW)):
+                # Entities hold their lists and lists their entities, so the last scene only goes in a collection
+                scene = None
+                gc.collect()
+                start = time.perf_counter()
+                build()
+                build_time = time.perf_counter() - start
+                tracemalloc.start()
+                scene = build()
+                memory = tracemalloc.get_traced_memory()[0]
+                tracemalloc.stop()
+                results.append((build_time, memory, scene_entities(scene)))
+
+            # Sweep the viewport across the streamed level a tile at a time. Each
+            # chunk past the first window is loaded once, and one dropped for it.
+            stream = scene.stream
+            most = 0
+            start = time.perf_counter()
+            for view_left in range(0, columns * copies * SCALED_TILE_SIZE, SCALED_TILE_SIZE):
+                stream.update(view_left)
+                most = max(most, scene_entities(scene))
+            sweep_time = time.perf_counter() - start
+            loads = max(stream.chunk_count - STREAM_WINDOW, 1)
+
+            (whole_time, whole_memory, whole_entities), (stream_time, stream_memory, stream_entities) = results
+            print(f"{columns * copies:>8} {whole_time * 1000:>9.1f} {whole_memory / 1e6:>9.1f} {whole_entities:>9} "
+                  f"{stream_time * 1000:>10.1f} {stream_memory / 1e6:>10.2f} {most:>9} {sweep_time * 1000 / loads:>9.2f}")
+
+
+def read_sound(path):
+    """
+    Reads a sound file into memory. arcade's load_sound also decodes it,
+    which needs pyglet, so this is only the part of a load that can be timed
+    without a window.
+    """
+    with open(path, "rb") as sound_file:
+        return sound_file.read()
+
+
+def read_texture(path, x=0, y=0, width=0, height=0):
+    """ Opens an image and crops it, as arcade's load_texture does when its cache misses """
+    image = PIL.Image.open(path).convert("RGBA")
+    if width and height:
+        image = image.crop((x, y, x + width, y + height))
+    return image
+
+
+def arcade_texture(cache, path, x=0, y=0, width=0, height=0):
+    """
+    Stands in for arcade 2.5.5's load_texture, which can't be imported
+    without a window. Like it, it formats a key out of every argument on
+    each call and only reads the image when that key isn't in its cache.
+    """
+    key = "{}-{}-{}-{}-{}-{}-{}-{}-{}".format(path, x, y, width, height, False, False, False, "Simple")
+    if key not in cache:
+        cache[key] = read_texture(path, x, y, width, height)
+    return cache[key]
+
+
+def time_repeats(function, repeats=20):
+    """ Returns function's fastest time out of repeats runs """
+    times = []
+    for repeat in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def tile_textures(lookup):
+    """ Returns a prepare_scene that gets every tile's texture through lookup, as the renderer does """
+    def prepare_scene(scene):
+        for list_name in LEVEL_LIST_NAMES:
+            for entity in getattr(scene, list_name):
+                if isinstance(entity.texture, int) or entity.texture == "door":
+                    lookup(entity.texture)
+    return prepare_scene
+
+
+def bench_level_load():
+    """
+    Times GameSimulation.load_level on every level, alone and with each
+    tile given its texture the old way, one load_texture call per tile, and
+    through the tileset. Textures come from PIL through arcade_texture and
+    an AssetManager, as arcade can't be imported without a window.
+    """
+    cells = dict(TILE_CELLS, door=DOOR_CELL)
+    arcade_cache = {}
+    spritesheet = os.path.join(ASSET_DIR, "sprites/spritesheet.png")
+    assets = AssetManager(read_texture, read_sound)
+    tileset = {tile: assets.texture("sprites/spritesheet.png", x, y, TILE_SIZE, TILE_SIZE)
+               for tile, (x, y) in cells.items()}
+    preparers = [
+        None,
+        tile_textures(lambda tile: arcade_texture(arcade_cache, spritesheet, *cells[tile], TILE_SIZE, TILE_SIZE)),
+        tile_textures(tileset.__getitem__),
+    ]
+
+    print(f"{'level':>6} {'tiles':>6} {'load_level ms':>14} {'+ load_texture ms':>18} {'+ tileset ms':>13}")
+    for level in sorted(LEVEL_MAPS):
+        simulation = GameSimulation(level, **GAME_SETTINGS)
+        times = []
+        for prepare_scene in preparers:
+            simulation.prepare_scene = prepare_scene
+            load_times = []
+            for repeat in range(LOAD_REPEATS * 4):
+                start = time.perf_counter()
+                simulation.load_level(level)
+                load_times.append(time.perf_counter() - start)
+            times.append(statistics.median(load_times))
+        tiles = len(map_cells(load_map(LEVEL_MAPS[level])))
+        print(f"{level:>6} {tiles:>6} {times[0] * 1000:>14.2f} {times[1] * 1000:>18.2f} {times[2] * 1000:>13.2f}")
+
+
+def bench_asset_loads():
+    """
+    Times the texture and sound loads a menu frame and a restart do, the
+    way the game used to make them and through the asset manager it uses now.
+    The old loads can't run without a window, so read_sound and
+    arcade_texture model them.
+    """
+    arcade_cache = {}
+    assets = AssetManager(read_texture, read_sound)
+
+    # The menu used to load its sound and background on every frame. Now
+    # it gets both from the asset manager, which has them after the first.
+    menu = ["sounds/quick sound.mp3", "sprites/mainscreen.png"]
+    menu_frame = time_repeats(lambda: (read_sound(assets.resolve(menu[0])),
+                                       arcade_texture(arcade_cache, assets.resolve(menu[1]))))
+    assets.sound(menu[0])
+    assets.texture(menu[1])
+    menu_cached = time_repeats(lambda: (assets.sound(menu[0]), assets.texture(menu[1])))
+
+    # A new game used to load every sound again, and its textures through
+    # load_texture's cache. Now all of them are asset manager hits.
+    hud = ["sprites/level_1.png", "sprites/heart.png", "sprites/scoretext.png", "sprites/bulletstext.png",
+           "sprites/bosstext.png"]
+    restart = time_repeats(lambda: ([read_sound(assets.resolve(filename)) for filename in GAME_SOUNDS.values()],
+                                    [arcade_texture(arcade_cache, assets.resolve(filename)) for filename in hud]))
+    for filename in GAME_SOUNDS.values():
+        assets.sound(filename)
+    for filename in hud:
+        assets.texture(filename)
+    cached = time_repeats(lambda: ([assets.sound(filename) for filename in GAME_SOUNDS.values()],
+                                   [assets.texture(filename) for filename in hud]))
+    print(f"{'':>16} {'modelled before ms':>19} {'after ms':>9}")
+    print(f"{'menu frame':>16} {menu_frame * 1000:>19.3f} {menu_cached * 1000:>9.3f}")
+    print(f"{'restart':>16} {restart * 1000:>19.3f} {cached * 1000:>9.3f}")
+
+
+def scripted_inputs(simulation, tick):
+    """ Runs right, jumping, attacking and shooting on a fixed beat, the same way every run """
+    inputs = []
+    if tick == 0:
+        inputs.append(("key_press", "D"))
+    if tick % 40 == 0:
+        inputs.append(("key_press", "W"))
+    if tick % 20 == 10:
+        inputs.append(("mouse_press", simulation.player.center_x + 200, simulation.player.center_y, "left"))
+    if tick % 30 == 15:
+        inputs.append(("mouse_press", simulation.player.center_x + 300, simulation.player.center_y + 50, "right"))
+    return inputs
+
+
+def percentile(times, fraction):
+    """ Returns the time that fraction of the times are at or under """
+    ordered = sorted(times)
+    return ordered[int(fraction * (len(ordered) - 1))]
+
+
+def open_window():
+    """
+    Opens a hidden window to draw the game in, drawing through software GL
+    unless LIBGL_ALWAYS_SOFTWARE says otherwise, so results don't depend on
+    the graphics card
+    """
+    os.environ.setdefault("LIBGL_ALWAYS_SOFTWARE", "1")
+    import arcade
+    import project
+    project.REPLAY_FILE = None
+    return arcade.Window(SCREEN_WIDTH, SCREEN_HEIGHT, "Titan Slayer benchmark", visible=False)
+
+
+def run_level(level, ticks, stress, window=None):
+    """
+    Times loading a level, then each tick of playing it with scripted
+    input. With a window, the level is played in a GameView, so loads
+    include making its sprites, and each tick's frame is drawn and timed too.
+    """
+    view = None
+    if window is None:
+        simulation = GameSimulation(level, **GAME_SETTINGS)
+    else:
+        import project
+        # Every load is timed in full, and no prefetch thread builds levels
+        # alongside the ticks being timed
+        view = project.GameView(prefetch=False)
+        window.show_view(view)
+        simulation = view.simulation
+
+    simulation.level = level
+    load_times = []
+    for repeat in range(LOAD_REPEATS):
+        start = time.perf_counter()
+        simulation.load_level(level)
+        load_times.append(time.perf_counter() - start)
+
+    simulation.lives = ticks
+    simulation.bullet_amount = ticks
+    if stress:
+        crowd_level(simulation, STRESS_COUNT, columns=simulation.scene.wall_grid.columns - 8)
+    enemies = len(simulation.titan_list) + len(simulation.police_list)
+
+    tick_times = []
+    draw_times = []
+    for tick in range(ticks):
+        inputs = scripted_inputs(simulation, tick)
+        start = time.perf_counter()
+        simulation.step(inputs, TICK_LENGTH)
+        tick_times.append(time.perf_counter() - start)
+
+        if view is not None:
+            start = time.perf_counter()
+            for layer in view.moving_layers:
+                layer.sync()
+            view.view_left = simulation.view_left
+            view.view_bottom = simulation.view_bottom
+            view.on_draw()
+            # Wait for GL to finish the frame, so it's counted here and not in a later one
+            window.ctx.finish()
+            draw_times.append(time.perf_counter() - start)
+
+    result = {
+        "enemies": enemies,
+        "load_ms": statistics.median(load_times) * 1000,
+        "tick_median_us": statistics.median(tick_times) * 1e6,
+        "tick_p99_us": percentile(tick_times, 0.99) * 1e6,
+    }
+    if draw_times:
+        result["draw_median_us"] = statistics.median(draw_times) * 1e6
+        result["draw_p99_us"] = percentile(draw_times, 0.99) * 1e6
+    return result
+
+
+def run_suite(ticks=SUITE_TICKS, stress=True, draw=False):
+    """ Runs every level, then every level again crowded if stress is set """
+    window = open_window() if draw else None
+    results = {}
+    for stressed in ([False, True] if stress else [False]):
+        for level in sorted(LEVEL_MAPS):
+            name = f"level_{level}_stress" if stressed else f"level_{level}"
+            results[name] = run_level(level, ticks, stressed, window)
+            print_result(name, results[name])
+    if window is not None:
+        window.close()
+    return {"ticks": ticks, "draw": draw, "python": sys.version.split()[0], "results": results}
+
+
+def print_result(name, result):
+    timings = "  ".join(f"{metric} {value:.1f}" for metric, value in result.items() if metric != "enemies")
+    print(f"{name:>16} {result['enemies']:>5} enemies  {timings}")
+
+
+def compare(suite, baseline, threshold=REGRESSION_THRESHOLD):
+    """
+    Returns a line for every timing that got slower than its baseline by
+    more than threshold. Runs or timings missing from either are skipped.
+    """
+    regressions = []
+    for name, result in suite["results"].items():
+        old_result = baseline["results"].get(name, {})
+        for metric, value in result.items():
+            if not metric.endswith(("_ms", "_us")) or metric not in old_result:
+                continue
+            old_value = old_result[metric]
+            if value > old_value * (1 + threshold):
+                regressions.append(f"{name} {metric}: {old_value:.1f} -> {value:.1f} "
+                                   f"(+{(value / old_value - 1) * 100:.0f}%)")
+    return regressions
+
+
+def suite_main(args):
+    """ python benchmark.py suite [--draw] [--out FILE] [--baseline FILE] """
+    parser = argparse.ArgumentParser(prog="benchmark.py suite",
+                                     description="Times loading, ticking and drawing every level")
+    parser.add_argument("--ticks", type=int, default=SUITE_TICKS, help="ticks to play each level for")
+    parser.add_argument("--no-stress", action="store_true", help="skip the crowded runs")
+    parser.add_argument("--draw", action="store_true", help="draw each tick in a hidden window too")
+    parser.add_argument("--out", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="fail if slower than the results in this JSON file")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="how much slower than the baseline counts as a regression, 0.2 being 20%%")
+    options = parser.parse_args(args)
+
+    suite = run_suite(options.ticks, not options.no_stress, options.draw)
+    if options.out:
+        with open(options.out, "w") as results_file:
+            json.dump(suite, results_file, indent=2)
+    if options.baseline:
+        with open(options.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare(suite, baseline, options.threshold)
+        for regression in regressions:
+            print("REGRESSION", regression)
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {options.baseline}")
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "suite":
+        suite_main(sys.argv[2:])
+        return
+    level = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    bench_wall_collisions(level)
+    bench_projectile_pools()
+    bench_entity_store()
+    bench_physics()
+    bench_enemy_broadphase()
+    bench_activation()
+    bench_streaming()
+    bench_level_load()
+    bench_asset_loads()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+# Titan Slayer
+# Enemies and projectiles as NumPy arrays
+
+import math
+
+# Only GameSimulation(vectorized=True) imports this module
+try:
+    import numpy
+except ImportError:
+    raise ImportError("the vectorized mode needs NumPy, which the game itself doesn't: pip install numpy") from None
+
+from simulation import check_for_collision_with_list
+
+# Rows allocated when a store is created, doubled whenever it fills up
+START_CAPACITY = 64
+
+# What a store keeps for each entity, one column of its table each
+COLUMNS = ["x", "y", "change_x", "change_y", "box_left", "box_right", "box_bottom", "box_top",
+           "boundary_left", "boundary_right", "health", "order"]
+
+
+class EntityStore:
+    """
+    Keeps the moving state of one entity list in a NumPy table, one row per
+    entity: position, speed, hit box sides, patrol bounds, health and the
+    order it joined the list in. Movement, patrol reversal and aiming run on
+    whole columns at once.
+
+    The entities themselves are only brought up to date when something looks
+    at them: the rows a rule picks out with near() or dead(), or every row
+    with sync() before the game is drawn or hashed.
+
+    The store listens to its entity list, so entities join and leave it as
+    they are added and removed. A removed entity's row is filled with the
+    last row, so rows aren't in list order, but the order column is.
+    """
+    def __init__(self, entity_list, capacity=START_CAPACITY):
+        self.entities = []
+        self.count = 0
+        self.added_count = 0
+        self.table = numpy.zeros((capacity, len(COLUMNS)))
+        self.name_columns()
+
+        self.entity_list = entity_list
+        entity_list.listeners.append(self)
+        for entity in entity_list:
+            self.added(entity)
+
+    def name_columns(self):
+        """ Makes each column of the table an attribute, x, y and so on """
+        for index, name in enumerate(COLUMNS):
+            setattr(self, name, self.table[:, index])
+
+    def grow(self):
+        """ Doubles the rows available """
+        grown = numpy.zeros((len(self.table) * 2, len(COLUMNS)))
+        grown[:self.count] = self.table[:self.count]
+        self.table = grown
+        self.name_columns()
+
+    def added(self, entity):
+        if self.count == len(self.table):
+            self.grow()
+        row = self.count
+
+        # Projectiles don't patrol, so they get bounds they can never cross
+        self.table[row] = (entity.center_x, entity.center_y, entity.change_x, entity.change_y,
+                           entity.box_left, entity.box_right, entity.box_bottom, entity.box_top,
+                           getattr(entity, "boundary_left", -math.inf), getattr(entity, "boundary_right", math.inf),
+                           getattr(entity, "_enemy_health", 0), self.added_count)
+
+        # From now on the entity's health lives in the store
+        entity.store = self
+        entity.store_index = row
+        self.entities.append(entity)
+        self.count += 1
+        self.added_count += 1
+
+    def removed(self, entity):
+        """
+        Hands the entity its state back, then moves the last row into its
+        place, so removing takes the same time however many rows there are
+        """
+        row = entity.store_index
+        entity.center_x, entity.center_y, entity.change_x = self.table[row, :3].tolist()
+        entity._enemy_health = self.health[row].item()
+        entity.store = None
+        entity.store_index = None
+
+        last = self.count - 1
+        moved = self.entities.pop()
+        if row != last:
+            self.table[row] = self.table[last]
+            self.entities[row] = moved
+            moved.store_index = row
+        self.count = last
+
+    def move(self):
+        """ Moves every entity by its speed """
+        count = self.count
+        self.x[:count] += self.change_x[:count]
+        self.y[:count] += self.change_y[:count]
+
+    def patrol(self):
+        """ Turns around every enemy that has walked past its patrol bounds """
+        count = self.count
+        x = self.x[:count]
+        past_left = x + self.box_left[:count] < self.boundary_left[:count]
+        past_right = x + self.box_right[:count] > self.boundary_right[:count]
+        turned = past_left | past_right
+        # Subtracting from 0.0 turns a speed of 0 into 0.0, not the -0.0 that
+        # multiplying by -1 gives, the same as the entities' whole-number 0
+        change_x = self.change_x[:count]
+        change_x[turned] = 0.0 - change_x[turned]
+
+    def aim(self, target_x, target_y):
+        """
+        Returns the angle from every row to the target. The differences
+        are taken on whole columns, but each angle comes from math.atan2,
+        which can round differently from numpy.arctan2, so bullets fly
+        exactly as they do without the store.
+        """
+        count = self.count
+        return [math.atan2(y_diff, x_diff) for y_diff, x_diff in zip((target_y - self.y[:count]).tolist(),
+                                                                      (target_x - self.x[:count]).tolist())]
+
+    def sync(self, rows=None):
+        """ Copies positions and speeds back onto the entities of the given rows, or of all of them """
+        if rows is None:
+            rows = numpy.arange(self.count)
+        entities = self.entities
+        for row, (x, y, change_x) in zip(rows.tolist(), self.table[rows, :3].tolist()):
+            entity = entities[row]
+            entity.center_x = x
+            entity.center_y = y
+            entity.change_x = change_x
+
+    def picked(self, rows):
+        """ Brings the entities of the given rows up to date and returns them in list order """
+        rows = rows[numpy.argsort(self.order[rows])]
+        self.sync(rows)
+        return [self.entities[row] for row in rows.tolist()]
+
+    def near(self, entity):
+        """
+        Returns the entities whose hit box bounds overlap the given entity's.
+        The sums and comparisons are check_for_collision's own, so these are
+        all the entities it could find a collision with.
+        """
+        count = self.count
+        x = self.x[:count]
+        y = self.y[:count]
+        overlap = ((entity.center_x + entity.box_left < x + self.box_right[:count])
+                   & (x + self.box_left[:count] < entity.center_x + entity.box_right)
+                   & (entity.center_y + entity.box_bottom < y + self.box_top[:count])
+                   & (y + self.box_bottom[:count] < entity.center_y + entity.box_top))
+        return self.picked(numpy.nonzero(overlap)[0])
+
+    def dead(self):
+        """ Returns the entities whose health has run out """
+        return self.picked(numpy.nonzero(self.health[:self.count] <= 0)[0])
+
+
+class VectorizedEnemies:
+    """
+    Runs enemy and projectile movement, patrols and police aiming through
+    EntityStores instead of looping over entities one by one.
+
+    Projectiles are checked against walls and the edge of the screen one by
+    one every tick, so their positions are written back every tick. Enemies'
+    are only written back for the few a rule looks at closer, found with
+    array comparisons: the titans by the player, the enemies a projectile
+    may hit and the dead.
+    """
+    def __init__(self, simulation):
+        self.simulation = simulation
+        self.bullets = EntityStore(simulation.bullet_list)
+        self.enemy_bullets = EntityStore(simulation.enemy_bullet_list)
+        self.scene_changed(None, simulation.scene)
+        simulation.scene_listeners.append(self)
+
+    def scene_changed(self, old_scene, scene):
+        """ Enemies belong to the level, so they get new stores with each scene """
+        self.titans = EntityStore(scene.titan_list)
+        self.police = EntityStore(scene.police_list)
+        self.stores = [self.titans, self.police, self.bullets, self.enemy_bullets]
+
+    def update(self):
+        """ Moves everything and turns enemies around """
+        for store in self.stores:
+            store.move()
+        self.titans.patrol()
+        self.police.patrol()
+        self.bullets.sync()
+        self.enemy_bullets.sync()
+
+    def sync(self):
+        """ Brings every entity up to date, for reading them outside the rules """
+        for store in self.stores:
+            store.sync()
+
+    def get_hits(self, entity):
+        """ Returns the titans and police the entity overlaps, the same as DynamicHash.get_hits """
+        return {"titan": check_for_collision_with_list(entity, self.titans.near(entity)),
+                "police": check_for_collision_with_list(entity, self.police.near(entity))}
+
+    def fire(self):
+        """
+        Every police officer shoots at the player. All of them fire on the
+        one POLICE_FIRE_INTERVAL timer, as the game always has, so there is
+        no fire timer for each row to keep.
+        """
+        simulation = self.simulation
+        player = simulation.player
+        police_store = self.police
+        angles = police_store.aim(player.center_x, player.center_y)
+        positions = police_store.table[:police_store.count, :2].tolist()
+        for police in list(simulation.police_list):
+            angle = angles[police.store_index]
+            bullet = simulation.enemy_bullet_pool.acquire()
+            bullet.center_x, bullet.center_y = positions[police.store_index]
+            bullet.angle = math.degrees(angle)
+            bullet.change_x = math.cos(angle) * 5
+            bullet.change_y = math.sin(angle) * 5
+            simulation.enemy_bullet_list.append(bullet)
+
+    def dead_enemies(self):
+        """ Returns the titans and police whose health has run out """
+        return self.titans.dead(), self.police.dead()
@@ -0,0 +1,290 @@
+# Titan Slayer
+# The game as a reinforcement learning environment, without a window
+
+import time
+
+# NumPy isn't needed to play the game, so it isn't in requirements.txt
+try:
+    import numpy
+except ImportError:
+    raise ImportError("environment.py needs NumPy, which the game itself doesn't: pip install numpy") from None
+
+from simulation import GAME_SETTINGS, SCALED_TILE_SIZE, TICK_LENGTH, TRIGGER_KINDS, GameSimulation
+
+# Actions, by number. Moving holds a key down until another move or stop.
+# Attacks and shots aim straight ahead of the way the player last moved.
+ACTIONS = ["nothing", "left", "right", "stop", "jump", "attack", "shoot"]
+
+# Game ticks each step plays. The action's input goes into the first.
+TICKS_PER_STEP = 4
+
+# Steps before an episode is cut short
+MAX_STEPS = 60 * 60 // TICKS_PER_STEP
+
+# What each tile is, in the tile observation
+EMPTY = 0
+WALL = 1
+TILE_CODES = {
+    "coin": 2,
+    "health_potion": 3,
+    "strength_potion": 4,
+    "gun": 5,
+    "lava": 6,
+    "door": 7,
+}
+# Tiles past the edges of the map
+OUTSIDE = 8
+
+# Size of the tile observation, centered on the player's tile
+OBSERVED_ROWS = 9
+OBSERVED_COLUMNS = 15
+
+# Nearest enemies and enemy bullets observed, as (dx, dy, change_x, change_y,
+# kind, health) with positions in tiles from the player. Kinds are 1 for a
+# titan, 2 for police and 3 for a bullet, and 0 marks an empty row.
+OBSERVED_ENTITIES = 16
+ENTITY_FEATURES = 6
+
+# (change_x, change_y, lives, bullets, attack damage, enemies left, level,
+# attack ready, hurt ready, facing left)
+PLAYER_FEATURES = 10
+
+# Reward for each point of score, enemy killed, life lost and level finished
+SCORE_REWARD = 0.1
+KILL_REWARD = 1.0
+LIFE_REWARD = -1.0
+LEVEL_REWARD = 5.0
+
+
+class TileObserver:
+    """
+    Keeps the level's tiles as a NumPy array of tile codes, padded with
+    OUTSIDE so a window around any tile can be sliced out directly. Like
+    the trigger grid, it listens to the level's lists, so tiles empty as
+    soon as their item is picked up. A new array is made for each scene.
+    """
+    def __init__(self, simulation):
+        self.pad_rows = OBSERVED_ROWS // 2
+        self.pad_columns = OBSERVED_COLUMNS // 2
+        self.scene_changed(None, simulation.scene)
+        simulation.scene_listeners.append(self)
+
+    def scene_changed(self, old_scene, scene):
+        wall_grid = scene.wall_grid
+        self.tiles = numpy.full((wall_grid.rows + 2 * self.pad_rows, wall_grid.columns + 2 * self.pad_columns),
+                                OUTSIDE, dtype=numpy.uint8)
+        self.tiles[self.pad_rows:-self.pad_rows, self.pad_columns:-self.pad_columns] = EMPTY
+        # Streamed levels add and drop walls as they go, so they are followed like pickups
+        self.grid = scene.trigger_grid
+        for entity_list in (scene.wall_list, scene.coin_list, scene.door_opened_list, scene.health_potion_list,
+                            scene.lava_list, scene.strength_potion_list, scene.gun_list):
+            entity_list.listeners.append(self)
+            for entity in entity_list:
+                self.added(entity)
+
+    def added(self, entity):
+        row, column = self.grid.cell_of(entity)
+        kind = TRIGGER_KINDS.get(entity.texture)
+        self.tiles[row + self.pad_rows, column + self.pad_columns] = TILE_CODES[kind] if kind else WALL
+
+    def removed(self, entity):
+        row, column = self.grid.cell_of(entity)
+        self.tiles[row + self.pad_rows, column + self.pad_columns] = EMPTY
+
+    def window(self, entity, out):
+        """ Copies the tiles around the entity's tile into out """
+        row, column = self.grid.cell_of(entity)
+        # The padding puts the entity's tile in the middle of the window
+        # starting at its own row and column. Entities far outside the map
+        # see only the edge of the padding.
+        row = min(max(row, 0), self.tiles.shape[0] - OBSERVED_ROWS)
+        column = min(max(column, 0), self.tiles.shape[1] - OBSERVED_COLUMNS)
+        out[:] = self.tiles[row:row + OBSERVED_ROWS, column:column + OBSERVED_COLUMNS]
+
+
+class TitanSlayerEnv:
+    """
+    One game played through reset and step, Gym style. Observations are a
+    dict of NumPy arrays: "tiles" around the player, the nearest "entities"
+    and the "player" itself. Nothing here needs a window or a GPU.
+    """
+    def __init__(self, level=1, ticks_per_step=TICKS_PER_STEP, max_steps=MAX_STEPS):
+        self.start_level = level
+        self.ticks_per_step = ticks_per_step
+        self.max_steps = max_steps
+        self.simulation = None
+
+    def observation_shapes(self):
+        return {
+            "tiles": (OBSERVED_ROWS, OBSERVED_COLUMNS),
+            "entities": (OBSERVED_ENTITIES, ENTITY_FEATURES),
+            "player": (PLAYER_FEATURES,),
+        }
+
+    def reset(self, level=None):
+        """ Starts a new game at level, or the level the environment was made with """
+        self.simulation = GameSimulation(level or self.start_level, **GAME_SETTINGS)
+        self.tile_observer = TileObserver(self.simulation)
+        self.held = None
+        self.faces_left = False
+        self.steps = 0
+        return self.observe()
+
+    def action_inputs(self, action):
+        """ Turns an action number into the input the game gets from the keyboard and mouse """
+        name = ACTIONS[action]
+        player = self.simulation.player
+        if name in ("left", "right"):
+            key = "A" if name == "left" else "D"
+            self.faces_left = name == "left"
+            inputs = [("key_release", self.held)] if self.held not in (None, key) else []
+            self.held = key
+            return inputs + [("key_press", key)]
+        if name == "stop":
+            inputs = [("key_release", self.held)] if self.held is not None else []
+            self.held = None
+            return inputs
+        if name == "jump":
+            return [("key_press", "W")]
+        if name in ("attack", "shoot"):
+            ahead = -SCALED_TILE_SIZE * 3 if self.faces_left else SCALED_TILE_SIZE * 3
+            button = "left" if name == "attack" else "right"
+            return [("mouse_press", player.center_x + ahead, player.center_y, button)]
+        return []
+
+    def step(self, action):
+        """ Plays the action for ticks_per_step ticks. Returns (observation, reward, done, info). """
+        simulation = self.simulation
+        level = simulation.level
+        score = simulation.score
+        lives = simulation.lives
+        enemies_left = simulation.enemies_left
+        inputs = self.action_inputs(action)
+        lives_lost = 0
+        for tick in range(self.ticks_per_step):
+            simulation.step(inputs, TICK_LENGTH)
+            inputs = []
+            # Potions give lives back, so only count the ones taken
+            lives_lost += max(lives - simulation.lives, 0)
+            lives = simulation.lives
+            if simulation.game_over or simulation.level != level:
+                break
+        self.steps += 1
+
+        # A new level brings a new count of enemies, and the door only opened with none left
+        finished = simulation.level != level or simulation.won
+        kills = enemies_left if finished else enemies_left - simulation.enemies_left
+        reward = (SCORE_REWARD * (simulation.score - score) + KILL_REWARD * kills
+                  + LIFE_REWARD * lives_lost + LEVEL_REWARD * finished)
+
+        fell = simulation.below_level()
+        done = simulation.game_over or fell or self.steps >= self.max_steps
+        info = {"level": simulation.level, "won": simulation.won, "fell": fell,
+                "truncated": self.steps >= self.max_steps and not simulation.game_over and not fell}
+        return self.observe(), reward, done, info
+
+    def observe(self, out=None):
+        """ Fills out, or new arrays, with what the player can see """
+        if out is None:
+            out = {name: numpy.zeros(shape, dtype=numpy.uint8 if name == "tiles" else numpy.float32)
+                   for name, shape in self.observation_shapes().items()}
+        simulation = self.simulation
+        simulation.sync_entities()
+        player = simulation.player
+        self.tile_observer.window(player, out["tiles"])
+
+        # The nearest enemies and bullets, relative to the player
+        entities = out["entities"]
+        entities[:] = 0
+        nearby = []
+        for kind, entity_list in ((1, simulation.titan_list), (2, simulation.police_list),
+                                  (3, simulation.enemy_bullet_list)):
+            for entity in entity_list:
+                dx = (entity.center_x - player.center_x) / SCALED_TILE_SIZE
+                dy = (entity.center_y - player.center_y) / SCALED_TILE_SIZE
+                nearby.append((dx * dx + dy * dy, dx, dy, entity, kind))
+        nearby.sort(key=lambda near: near[0])
+        for row, (distance, dx, dy, entity, kind) in enumerate(nearby[:OBSERVED_ENTITIES]):
+            health = entity.enemy_health if kind != 3 else 0
+            entities[row] = (dx, dy, entity.change_x, entity.change_y, kind, health)
+
+        out["player"][:] = (player.change_x, player.change_y, simulation.lives, simulation.bullet_amount,
+                            simulation.player_attack_dmg, simulation.enemies_left, simulation.level,
+                            simulation.attack_cooldown.ready, simulation.dmg_cooldown.ready, self.faces_left)
+        return out
+
+
+class VectorEnv:
+    """
+    Steps count games and returns their observations stacked, one row per
+    game, in arrays that are reused from step to step. The games are
+    stepped one after another in a plain Python loop; only their
+    observations are batched. A game that ends starts again straight away;
+    the observation it ended on is in its info as "final_observation".
+    """
+    def __init__(self, count, levels=None, ticks_per_step=TICKS_PER_STEP, max_steps=MAX_STEPS):
+        if levels is None:
+            levels = [1] * count
+        self.envs = [TitanSlayerEnv(level, ticks_per_step, max_steps) for level in levels]
+        shapes = self.envs[0].observation_shapes()
+        self.observations = {name: numpy.zeros((count,) + shape, dtype=numpy.uint8 if name == "tiles" else numpy.float32)
+                             for name, shape in shapes.items()}
+        self.rewards = numpy.zeros(count, dtype=numpy.float32)
+        self.dones = numpy.zeros(count, dtype=bool)
+
+    def row(self, index):
+        """ One game's observation, as views into the stacked arrays """
+        return {name: array[index] for name, array in self.observations.items()}
+
+    def reset(self):
+        for index, env in enumerate(self.envs):
+            env.reset()
+            env.observe(self.row(index))
+        return self.observations
+
+    def step(self, actions):
+        """ Steps every game with its action. Returns (observations, rewards, dones, infos). """
+        infos = []
+        for index, (env, action) in enumerate(zip(self.envs, actions)):
+            observation, reward, done, info = env.step(int(action))
+            self.rewards[index] = reward
+            self.dones[index] = done
+            if done:
+                info["final_observation"] = observation
+                env.reset()
+                env.observe(self.row(index))
+            else:
+                # Reuse the stacked rows instead of the step's own arrays
+                for name, array in observation.items():
+                    self.observations[name][index] = array
+            infos.append(info)
+        return self.observations, self.rewards, self.dones, infos
+
+
+def main():
+    """ Times random play through a single game and a batch of games """
+    rng = numpy.random.default_rng(0)
+    env = TitanSlayerEnv()
+    env.reset()
+    steps = 2000
+    start = time.perf_counter()
+    for step in range(steps):
+        observation, reward, done, info = env.step(int(rng.integers(len(ACTIONS))))
+        if done:
+            env.reset()
+    seconds = time.perf_counter() - start
+    print(f"TitanSlayerEnv: {steps / seconds:.0f} steps/s ({steps * env.ticks_per_step / seconds:.0f} ticks/s)")
+
+    for count in (8, 64):
+        vector_env = VectorEnv(count)
+        vector_env.reset()
+        batches = max(steps // count, 1)
+        start = time.perf_counter()
+        for batch in range(batches):
+            vector_env.step(rng.integers(len(ACTIONS), size=count))
+        seconds = time.perf_counter() - start
+        print(f"VectorEnv({count}): {batches * count / seconds:.0f} steps/s")
+
+
+if __name__ == "__main__":
+    main()
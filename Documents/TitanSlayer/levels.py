@@ -0,0 +1,288 @@
+# Titan Slayer
+# Level files
+
+import glob
+import mmap
+import os
+import re
+import struct
+
+from assets import ASSET_DIR
+
+# Compiled levels are a fixed header followed by one byte per tile,
+# row by row, top row first. Levels can be millions of tiles wide.
+LEVEL_MAGIC = b"TSLV"
+LEVEL_VERSION = 2
+LEVEL_HEADER = struct.Struct("<4sBHIq")
+LEVEL_EXTENSION = ".lvl"
+
+# A tile that isn't empty, in a compiled row
+FILLED_TILES = re.compile(rb"[^\x00]")
+
+# Map file for each level, found from the game folder
+LEVEL_MAPS = {
+    1: os.path.join(ASSET_DIR, "maps/level_1.csv"),
+    2: os.path.join(ASSET_DIR, "maps/level_2.csv"),
+    3: os.path.join(ASSET_DIR, "maps/level_3.csv"),
+    4: os.path.join(ASSET_DIR, "maps/level_4.csv"),
+    5: os.path.join(ASSET_DIR, "maps/level_5.csv"),
+    6: os.path.join(ASSET_DIR, "maps/level_6.csv"),
+}
+
+# Enemies in each level as (list, image, scale, center_x, center_y, change_x,
+# range_x, health). Positions and ranges are in tiles, and the scale is
+# relative to SPRITE_SCALING.
+LEVEL_SPAWNS = {
+    1: [
+        ("titan", "sprites/titan.png", 1, 14, -7, 1, 2, 6),
+        ("titan", "sprites/titan.png", 1, 22, -6, 1, 1, 6),
+        ("titan", "sprites/titan.png", 1, 39, -7, 1, 2, 6),
+        ("titan", "sprites/titan.png", 1, 50, -10, 1, 4, 6),
+    ],
+    2: [
+        ("titan", "sprites/titan.png", 1, 22, -6, 1, 1, 6),
+        ("titan", "sprites/titan.png", 1, 16, -4, 1, 2, 6),
+        ("titan", "sprites/titan.png", 1, 39, -7, 1, 2, 6),
+        ("titan", "sprites/titan.png", 1, 27, -10, 1, 2, 6),
+        ("titan", "sprites/titan.png", 1, 50, -7, 1, 2, 6),
+    ],
+    3: [
+        ("titan", "sprites/titan.png", 1, 14, -9, 1, 1, 6),
+        ("titan", "sprites/abnormal.png", 1, 24, -6, 3, 2, 8),
+        ("titan", "sprites/titan.png", 1, 32, -7, 1, 2, 6),
+        ("titan", "sprites/abnormal.png", 1, 31, -7, 3, 3, 8),
+        ("titan", "sprites/abnormal.png", 1, 39, -7, 3, 2, 6),
+        ("titan", "sprites/titan.png", 1, 50, -7, 1, 2, 8),
+    ],
+    4: [
+        ("titan", "sprites/abnormal.png", 1, 24, -8, 3, 2, 8),
+        ("titan", "sprites/abnormal.png", 1, 31, -7, 3, 3, 8),
+        ("titan", "sprites/titan.png", 1, 8, -7, 1, 4, 6),
+        ("titan", "sprites/abnormal.png", 1, 8, -7, 3, 4, 8),
+        ("titan", "sprites/titan.png", 1, 51, -4, 1, 1, 6),
+        ("titan", "sprites/titan.png", 1, 45, -7, 1, 1, 6),
+        ("titan", "sprites/abnormal.png", 1, 42.5, -6, 3, 1.5, 8),
+        ("titan", "sprites/titan.png", 1, 59.5, -5, 1, 1.5, 6),
+    ],
+    5: [
+        ("police", "sprites/police.png", 1, 23.5, -7.6, 0, 0, 6),
+        ("police", "sprites/police.png", 1, 10, -7.6, 2, 1, 6),
+        ("titan", "sprites/titan.png", 1, 13.5, -9, 1, 1.5, 6),
+        ("titan", "sprites/titan.png", 1, 19, -8, 1, 1, 6),
+        ("police", "sprites/police.png", 1, 31, -7.6, 2, 3, 6),
+        ("titan", "sprites/abnormal.png", 1, 31, -7, 3, 3, 8),
+        ("police", "sprites/police.png", 1, 44, -5.6, 2, 1, 6),
+        ("titan", "sprites/abnormal.png", 1, 51, -4, 3, 1, 8),
+    ],
+    6: [
+        ("police", "sprites/police.png", 1, 11, -5.6, 2, 1, 6),
+        ("titan", "sprites/abnormal.png", 1, 18, -4, 3, 2, 8),
+        ("titan", "sprites/titan.png", 1, 17, -4, 1, 2, 6),
+        ("police", "sprites/police.png", 1, 16, -7.6, 2, 4, 6),
+        ("police", "sprites/police.png", 1, 19, -7.6, -2, 4, 6),
+        ("titan", "sprites/abnormal.png", 1, 23, -7, 3, 4, 6),
+        # BOSS
+        ("titan", "sprites/bert.png", 1.5, 45, -5.2, 5, 6, 30),
+    ],
+}
+
+
+def get_map(filename):
+    """
+    This function loads an array based on a map stored as a list of
+    numbers separated by commas.
+    """
+    # Open the file
+    map_file = open(filename)
+
+    # Create an empty list of rows that will hold our map
+    map_array = []
+
+    # Read in a line from the file
+    for line in map_file:
+
+        # Strip the whitespace, and \n at the end
+        line = line.strip()
+
+        # This creates a list by splitting line everywhere there is a comma.
+        map_row = line.split(",")
+
+        # The list currently has all the numbers stored as text, and we want it
+        # as a number. (e.g. We want 1 not "1"). So loop through and convert
+        # to an integer.
+        for index, item in enumerate(map_row):
+            map_row[index] = int(item)
+
+        # Now that we've completed processing the row, add it to our map array.
+        map_array.append(map_row)
+
+    # Done, return the map.
+    return map_array
+
+
+def compiled_name(filename):
+    """ Where the compiled copy of a CSV map lives """
+    return os.path.splitext(filename)[0] + LEVEL_EXTENSION
+
+
+def compile_map(filename):
+    """
+    Parses a CSV map and writes its compiled copy next to it.
+    Returns the parsed map, or None if it doesn't fit the binary format.
+    """
+    map_array = get_map(filename)
+    rows = len(map_array)
+    columns = len(map_array[0]) if rows else 0
+
+    # The format only holds rectangular grids of tile IDs 0-255
+    for map_row in map_array:
+        if len(map_row) != columns:
+            return None
+        for item in map_row:
+            if item < 0 or item > 255:
+                return None
+
+    header = LEVEL_HEADER.pack(LEVEL_MAGIC, LEVEL_VERSION, rows, columns,
+                               os.stat(filename).st_mtime_ns)
+    # Write to a temporary file first so a half-written level is never read
+    temp_name = compiled_name(filename) + ".tmp"
+    with open(temp_name, "wb") as level_file:
+        level_file.write(header)
+        for map_row in map_array:
+            level_file.write(bytes(map_row))
+    os.replace(temp_name, compiled_name(filename))
+    return map_array
+
+
+class MapStream:
+    """
+    A compiled map kept memory-mapped, so its tiles are read from the file
+    a range of columns at a time and only the columns asked for are ever
+    loaded.
+    """
+    def __init__(self, data, rows, columns):
+        self.data = data
+        self.rows = rows
+        self.columns = columns
+
+    def row(self, row):
+        start = LEVEL_HEADER.size + row * self.columns
+        return self.data[start:start + self.columns]
+
+    def cells(self, first_column, last_column):
+        """ Returns (row, column, tile ID) for every cell that isn't empty in the columns, row by row """
+        first_column = max(first_column, 0)
+        last_column = min(last_column, self.columns - 1)
+        cells = []
+        for row in range(self.rows):
+            start = LEVEL_HEADER.size + row * self.columns
+            map_row = self.data[start + first_column:start + last_column + 1]
+            for match in FILLED_TILES.finditer(map_row):
+                cells.append((row, first_column + match.start(), map_row[match.start()]))
+        return cells
+
+    def close(self):
+        self.data.close()
+
+
+def open_compiled_map(filename):
+    """
+    Opens the compiled copy of a CSV map as a MapStream. Returns None if it
+    is missing, damaged, or older than the CSV.
+    """
+    try:
+        level_file = open(compiled_name(filename), "rb")
+    except OSError:
+        return None
+
+    with level_file:
+        # An empty file can't be memory-mapped
+        if os.fstat(level_file.fileno()).st_size < LEVEL_HEADER.size:
+            return None
+        data = mmap.mmap(level_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, version, rows, columns, mtime = LEVEL_HEADER.unpack_from(data)
+    if (magic != LEVEL_MAGIC or version != LEVEL_VERSION or mtime != os.stat(filename).st_mtime_ns
+            or len(data) != LEVEL_HEADER.size + rows * columns):
+        data.close()
+        return None
+    return MapStream(data, rows, columns)
+
+
+def read_compiled_map(filename):
+    """
+    Reads the compiled copy of a CSV map. Returns None if it is missing,
+    damaged, or older than the CSV.
+    """
+    map_stream = open_compiled_map(filename)
+    if map_stream is None:
+        return None
+
+    # Each row comes back as bytes, which index to ints like the CSV rows
+    map_array = [map_stream.row(row) for row in range(map_stream.rows)]
+    map_stream.close()
+    return map_array
+
+
+def open_map_stream(filename):
+    """
+    Opens a CSV map for streaming through its compiled copy, rebuilding the
+    copy when the CSV has changed. Returns None if it can't be compiled.
+    """
+    map_stream = open_compiled_map(filename)
+    if map_stream is not None:
+        return map_stream
+    try:
+        if compile_map(filename) is None:
+            return None
+    except OSError:
+        return None
+    return open_compiled_map(filename)
+
+
+def load_map(filename):
+    """
+    Loads a CSV map through its compiled copy, rebuilding the copy when the
+    CSV has changed. Falls back to parsing the CSV if it can't be compiled.
+    """
+    map_array = read_compiled_map(filename)
+    if map_array is not None:
+        return map_array
+
+    try:
+        map_array = compile_map(filename)
+    except OSError:
+        map_array = None
+    if map_array is None:
+        map_array = get_map(filename)
+    return map_array
+
+
+def map_cells(map_array):
+    """
+    Returns (row, column, tile ID) for every cell that isn't empty, row by
+    row. Compiled rows are searched in C, so empty cells cost next to nothing.
+    """
+    cells = []
+    for row_index, map_row in enumerate(map_array):
+        if isinstance(map_row, bytes):
+            for match in FILLED_TILES.finditer(map_row):
+                cells.append((row_index, match.start(), map_row[match.start()]))
+        else:
+            for column_index, item in enumerate(map_row):
+                if item:
+                    cells.append((row_index, column_index, item))
+    return cells
+
+
+def main():
+    """ Compiles every level in the maps folder """
+    for filename in sorted(glob.glob(os.path.join(ASSET_DIR, "maps", "level_*.csv"))):
+        if compile_map(filename) is None:
+            print(f"{filename}: can't be compiled, it will be loaded from CSV")
+        else:
+            print(f"{filename} -> {compiled_name(filename)}")
+
+
+if __name__ == "__main__":
+    main()
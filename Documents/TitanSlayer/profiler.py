@@ -0,0 +1,107 @@
+# Titan Slayer
+# Timing the parts of each frame
+
+import json
+import time
+
+# Frames kept, 10 seconds at 60 fps
+PROFILE_FRAMES = 600
+
+
+class Profiler:
+    """
+    Times named zones of each frame into a ring buffer holding the last
+    capacity frames. Zones are started and stopped around the code they
+    time, and can nest. The same zone can run more than once in a frame.
+
+    While the profiler is off, starting and stopping a zone is one check
+    and a return, so the calls can stay in the game.
+    """
+    def __init__(self, capacity=PROFILE_FRAMES):
+        self.enabled = False
+        self.frames = [None] * capacity
+        self.frame_count = 0
+
+        # The frame being timed, if there is one
+        self.spans = None
+        self.frame_start = 0.0
+        self.open_zones = []
+
+    def begin_frame(self):
+        """ Starts timing a frame, if the profiler is on """
+        if self.spans is not None:
+            self.end_frame()
+        if self.enabled:
+            self.spans = []
+            self.open_zones = []
+            self.frame_start = time.perf_counter()
+
+    def end_frame(self):
+        """ Stores the frame's zones in the ring buffer """
+        if self.spans is None:
+            return
+        end = time.perf_counter()
+        # Zones a frame left early from end with it
+        while self.open_zones:
+            name, start = self.open_zones.pop()
+            self.spans.append((name, start, end, len(self.open_zones)))
+        self.frames[self.frame_count % len(self.frames)] = (self.frame_start, end, self.spans)
+        self.frame_count += 1
+        self.spans = None
+
+    def start(self, name):
+        if self.spans is not None:
+            self.open_zones.append((name, time.perf_counter()))
+
+    def stop(self):
+        if self.spans is not None and self.open_zones:
+            name, start = self.open_zones.pop()
+            self.spans.append((name, start, time.perf_counter(), len(self.open_zones)))
+
+    def recent_frames(self, count=None):
+        """ Returns the last count frames kept, oldest first, as (start, end, spans) """
+        kept = min(self.frame_count, len(self.frames))
+        if count is None or count > kept:
+            count = kept
+        first = self.frame_count - count
+        return [self.frames[index % len(self.frames)] for index in range(first, self.frame_count)]
+
+    def summary(self, count=None):
+        """
+        Returns the mean and worst frame time over the last count frames, and
+        (name, mean time per frame, depth) for each zone, in the order they
+        first ran. Times are in seconds.
+        """
+        frames = self.recent_frames(count)
+        if not frames:
+            return 0.0, 0.0, []
+        totals = {}
+        depths = {}
+        for frame_start, frame_end, spans in frames:
+            # Spans are stored as they end, so sort them back into the order they started
+            for name, start, end, depth in sorted(spans, key=lambda span: span[1]):
+                totals[name] = totals.get(name, 0.0) + end - start
+                depths.setdefault(name, depth)
+        frame_times = [frame_end - frame_start for frame_start, frame_end, spans in frames]
+        zones = [(name, total / len(frames), depths[name]) for name, total in totals.items()]
+        return sum(frame_times) / len(frames), max(frame_times), zones
+
+    def chrome_trace(self):
+        """
+        Returns the frames kept in Chrome's trace event format, for
+        chrome://tracing or Perfetto. Each frame and zone is a complete event.
+        """
+        events = []
+        frames = self.recent_frames()
+        for number, (frame_start, frame_end, spans) in enumerate(frames, self.frame_count - len(frames)):
+            events.append({"name": "frame", "cat": "frame", "ph": "X", "pid": 1, "tid": 1,
+                           "ts": frame_start * 1e6, "dur": (frame_end - frame_start) * 1e6,
+                           "args": {"frame": number}})
+            for name, start, end, depth in spans:
+                events.append({"name": name, "cat": "zone", "ph": "X", "pid": 1, "tid": 1,
+                               "ts": start * 1e6, "dur": (end - start) * 1e6})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export_chrome_trace(self, filename):
+        with open(filename, "w") as trace_file:
+            json.dump(self.chrome_trace(), trace_file)
@@ -3,136 +3,133 @@
 # Titan Slayer
 
 import arcade
-import math
-
-# CONSTANTS
-SPRITE_SCALING = 1
-SCREEN_WIDTH = 800
-SCREEN_HEIGHT = 600
-
-# Pixels to keep as minimum margin between character and edge of screen
-VIEWPORT_MARGIN = 192
-RIGHT_MARGIN = 260
-TILE_SIZE = 64
-SCALED_TILE_SIZE = TILE_SIZE * SPRITE_SCALING
-MAP_HEIGHT = 7
-
-# Physics
-MOVEMENT_SPEED = 4
-JUMP_SPEED = 8
-GRAVITY = 0.5
-attack_SPEED = 5
-
-def get_map(filename):
+import argparse
+import itertools
+import os
+
+import PIL.Image
+
+from assets import DOOR_CELL, GAME_SOUNDS, TILE_CELLS, AssetManager
+from profiler import Profiler
+from replay import Recorder
+from simulation import (GAME_SETTINGS, LEVEL_LIST_NAMES, TICK_LENGTH, FixedTimestep, GameSimulation,
+                        SCREEN_HEIGHT, SCREEN_WIDTH, SCALED_TILE_SIZE, TILE_SIZE)
+
+# Width of the level covered by each chunk of a sprite layer. Sprites must
+# be narrower than this to be drawn when they hang over a chunk's edge.
+CHUNK_WIDTH = 8 * SCALED_TILE_SIZE
+
+# Level lists whose entities never move once the level is built
+STATIC_LIST_NAMES = ["wall_list", "coin_list", "door_opened_list", "door_list",
+                     "health_potion_list", "lava_list", "strength_potion_list", "gun_list"]
+
+# Static layers are drawn from one image per chunk, baked when the level is
+# prepared, instead of a sprite per tile. False draws them as sprites.
+BAKE_STATIC_LAYERS = True
+BAKED_LIST_NAMES = ["wall_list", "door_list", "door_opened_list", "lava_list"]
+
+# Level lists in the order they are drawn, back to front. The opened door
+# is drawn last, once all enemies are gone.
+DRAW_ORDER = ["wall_list", "titan_list", "coin_list", "health_potion_list", "strength_potion_list", "door_list",
+              "bullet_list", "gun_list", "player_list", "attack_list", "lava_list", "enemy_bullet_list", "police_list"]
+
+# F3 turns the profiler and its overlay on and off, and F4 saves the frames
+# it kept as a Chrome trace
+PROFILER_KEY = arcade.key.F3
+TRACE_KEY = arcade.key.F4
+# Frames the overlay averages over, and how many go by before it is redrawn
+OVERLAY_FRAMES = 60
+OVERLAY_REFRESH = 30
+
+# Keys the game listens to, as the simulation names them
+GAME_KEYS = {
+    arcade.key.W: "W",
+    arcade.key.A: "A",
+    arcade.key.D: "D",
+}
+
+# Player animation -> (y of its row in the spritesheet, number of frames)
+PLAYER_ANIMATIONS = {
+    "idle": (0, 1),
+    "walk_left": (128, 4),
+    "walk_right": (192, 4),
+}
+
+# Where each game's input is recorded, to be played back with replay.py.
+# Recording is off unless the game is started with --record.
+REPLAY_FILE = None
+DEFAULT_REPLAY_FILE = "last_game.tsr"
+
+# Where F4 saves the profiler's Chrome trace. Like the replay, it goes in
+# the working directory unless the game is started with --trace.
+TRACE_FILE = "profile_trace.json"
+
+_tileset = None
+
+assets = AssetManager(arcade.load_texture, arcade.load_sound)
+
+
+def game_manifest():
+    """ Everything a new game loads, for preloading from the menu """
+    manifest = [("sound", filename) for filename in GAME_SOUNDS.values()]
+    for filename in ["sprites/level_1.png", "sprites/heart.png", "sprites/scoretext.png",
+                     "sprites/bulletstext.png", "sprites/bosstext.png", "sprites/titan.png",
+                     "sprites/abnormal.png", "sprites/bert.png", "sprites/police.png",
+                     "sprites/bullet.png", "sprites/invisible.png", "bg images/end_screen.png"]:
+        manifest.append(("texture", filename, 0, 0, 0, 0))
+    for x, y in list(TILE_CELLS.values()) + [DOOR_CELL]:
+        manifest.append(("texture", "sprites/spritesheet.png", x, y, TILE_SIZE, TILE_SIZE))
+    for y, frames in PLAYER_ANIMATIONS.values():
+        for i in range(frames):
+            manifest.append(("texture", "sprites/spritesheet.png", i * 64, y, 64, 64))
+    return manifest
+
+
+class Tileset:
+    """ Slices the spritesheet into one texture per tile ID """
+    def __init__(self, filename):
+        self.textures = {}
+        for tile_id, (x, y) in TILE_CELLS.items():
+            self.textures[tile_id] = assets.texture(filename, x = x, y = y, width = TILE_SIZE, height = TILE_SIZE)
+        self.door = assets.texture(filename, x = DOOR_CELL[0], y = DOOR_CELL[1], width = TILE_SIZE, height = TILE_SIZE)
+
+    def __getitem__(self, tile_id):
+        return self.textures[tile_id]
+
+
+def get_tileset():
     """
-    This function loads an array based on a map stored as a list of
-    numbers separated by commas.
+    Returns the shared tileset, loading it the first time it is needed.
+    Every level reuses the same Texture objects, so their hit boxes are
+    only calculated once.
     """
-    # Open the file
-    map_file = open(filename)
+    global _tileset
+    if _tileset is None:
+        _tileset = Tileset("sprites/spritesheet.png")
+    return _tileset
 
-    # Create an empty list of rows that will hold our map
-    map_array = []
 
-    # Read in a line from the file
-    for line in map_file:
-
-        # Strip the whitespace, and \n at the end
-        line = line.strip()
-
-        # This creates a list by splitting line everywhere there is a comma.
-        map_row = line.split(",")
-
-        # The list currently has all the numbers stored as text, and we want it
-        # as a number. (e.g. We want 1 not "1"). So loop through and convert
-        # to an integer.
-        for index, item in enumerate(map_row):
-            map_row[index] = int(item)
+class MenuView(arcade.View):
+    """ Start Menu Application Class """
+    def __init__(self):
 
-        # Now that we've completed processing the row, add it to our map array.
-        map_array.append(map_row)
+        # Call parent class
+        super().__init__()
 
-    # Done, return the map.
-    return map_array
+        # Sounds
+        # SOURCE: zatplat.com
+        self.select = assets.sound("sounds/quick sound.mp3")
 
+        # Set image
+        self.background = assets.texture("sprites/mainscreen.png")
 
-class Enemy(arcade.Sprite):
-    """ This class holds enemy information """
-    def __init__(self, filename, scale):
-        
-        # Call Parent Class
-        super().__init__(filename, scale)
-        self.enemy_sprite = None
-        self.enemy_health = 0
-        
-    def attributes(self, center_x, center_y, change_x, range_x, health):
-        """ Controls enemy's mindless movement """
-        self.center_x = center_x * SCALED_TILE_SIZE
-        self.center_y = center_y * SCALED_TILE_SIZE
-        self.change_x = change_x
-        self.range_x = range_x
-        self.boundary_left = self.center_x - (range_x * SCALED_TILE_SIZE)
-        self.boundary_right = self.center_x + (range_x * SCALED_TILE_SIZE)
-        self.enemy_health = health
-    
-    def enemy_update(self):
-        """ Updates enemy's movement """
-        # If the enemy hit the left boundary, reverse
-        if self.left < self.boundary_left:
-            self.change_x *= -1
-        # If the self hit the right boundary, reverse
-        elif self.right > self.boundary_right:
-            self.change_x *= -1
-            
-    def shooting_update(self, player_sprite, bullet_list, frame_count):
-        """ Lets enemies shoot at player """
-        self.bullet_list = bullet_list
-        
-        # Bullet comes from enemy's center
-        start_x = self.center_x
-        start_y = self.center_y
-        
-        # Bullet aims at player
-        dest_x = player_sprite.center_x
-        dest_y = player_sprite.center_y
-        
-        # Do math to calculate how to get the bullet to the destination.
-        # Calculation the angle in radians between the start points
-        # and end points. This is the angle the bullet will travel.
-        x_diff = dest_x - start_x
-        y_diff = dest_y - start_y
-        angle = math.atan2(y_diff, x_diff)        
-        
-        # Shoot every 150 frames change of shooting each frame
-        if frame_count % 150 == 0:
-            bullet = arcade.Sprite("sprites/bullet.png", 0.5)
-            bullet.center_x = start_x
-            bullet.center_y = start_y 
-                
-            # Angle the bullet sprite
-            bullet.angle = math.degrees(angle)
-                
-            # Taking into account the angle, calculate our change_x
-            # and change_y. Velocity is how fast the bullet travels.
-            bullet.change_x = math.cos(angle) * 5
-            bullet.change_y = math.sin(angle) * 5
-    
-            self.bullet_list.append(bullet)
-            
+        # Load the game while the player is still on the menu
+        assets.preload(game_manifest())
 
-class MenuView(arcade.View):
-    """ Start Menu Application Class """
     def on_draw(self):
         """ Display on screen """
         arcade.start_render()
-        
-        # Sounds
-        # SOURCE: zatplat.com
-        self.select = arcade.load_sound("sounds/quick sound.mp3")
-        
-        # Set image 
-        background = arcade.load_texture("sprites/mainscreen.png")
-        arcade.draw_lrwh_rectangle_textured(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT, background)
+        arcade.draw_lrwh_rectangle_textured(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT, self.background)
 
     def on_key_press(self, key, modifiers):
         """ When key is pressed, advance to next screen """
@@ -155,14 +152,14 @@ class InstructionView(arcade.View):
         
         # Load instructions
         self.screen = 1
-        self.page_1 = arcade.load_texture("bg images/instructions_2.png")
-        self.page_2 = arcade.load_texture("bg images/instructions_1.png")
-        self.page_3 = arcade.load_texture("bg images/instructions_3.png")
-        self.page_4 = arcade.load_texture("bg images/instructions_4.png")
+        self.page_1 = assets.texture("bg images/instructions_2.png")
+        self.page_2 = assets.texture("bg images/instructions_1.png")
+        self.page_3 = assets.texture("bg images/instructions_3.png")
+        self.page_4 = assets.texture("bg images/instructions_4.png")
         
         # Sounds
         # SOURCE: zatplat.com
-        self.select = arcade.load_sound("sounds/quic sound 2.mp3")        
+        self.select = assets.sound("sounds/quic sound 2.mp3")        
         
     def on_draw(self):
         """ Draw instruction pages """
@@ -206,12 +203,13 @@ class GameOverView(arcade.View):
         arcade.set_viewport(0, SCREEN_WIDTH, 0, SCREEN_HEIGHT)
         
         self.score = 0
+        self.score_text = HudText(600, 310, 54, arcade.color.WHITE)
         
-        self.end_screen = arcade.load_texture("bg images/end_screen.png")
+        self.end_screen = assets.texture("bg images/end_screen.png")
         
         # Sounds
         # SOURCE: zatplat.com
-        self.select = arcade.load_sound("sounds/quick sound.mp3")        
+        self.select = assets.sound("sounds/quick sound.mp3")        
 
     def on_draw(self):
         """ Draw this view """
@@ -219,8 +217,8 @@ class GameOverView(arcade.View):
         
         # Draw text
         arcade.draw_lrwh_rectangle_textured(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT, self.end_screen)
-        output_total = f"{self.score}"
-        arcade.draw_text(output_total, 600, 310, arcade.color.WHITE, 54)        
+        self.score_text.set(f"{self.score}")
+        self.score_text.draw()        
 
     def on_key_press(self, key, modifiers):
         """ If the user presses space button, re-start the game. """
@@ -230,734 +228,493 @@ class GameOverView(arcade.View):
             self.window.show_view(menu_view)
             
             
-class GameView(arcade.View):
-    """ Game Application """
+class SpriteLayer:
+    """
+    Keeps arcade.SpriteLists in step with one of the simulation's entity
+    lists, creating and removing sprites as entities come and go. Sprites
+    are kept in chunks CHUNK_WIDTH wide by where they are in the level, so
+    drawing only touches the chunks on screen. Static layers never move
+    their sprites, so arcade can skip re-sending their positions.
+
+    Moving sprites are drawn part way between where their entities were
+    before the last tick and where they are now, so movement looks smooth
+    when the screen redraws faster or slower than the game ticks.
+    """
+    def __init__(self, entity_list, make_sprite, is_static=False):
+        self.entity_list = entity_list
+        self.make_sprite = make_sprite
+        self.is_static = is_static
+        self.chunks = {}
+        entity_list.listeners.append(self)
+        for entity in entity_list:
+            self.added(entity)
+
+    def added(self, entity):
+        # Pooled entities come back with the sprite they had last time
+        if entity.sprite is None:
+            entity.sprite = self.make_sprite(entity)
+        entity.sprite.center_x = entity.center_x
+        entity.sprite.center_y = entity.center_y
+        entity.sprite.angle = entity.angle
+        entity.sprite.last_x = entity.center_x
+        entity.sprite.last_y = entity.center_y
+        self.place(entity.sprite)
+
+    def removed(self, entity):
+        self.unplace(entity.sprite)
+
+    def place(self, sprite):
+        """ Puts a sprite in the chunk under its center """
+        sprite.chunk = int(sprite.center_x // CHUNK_WIDTH)
+        if sprite.chunk not in self.chunks:
+            self.chunks[sprite.chunk] = arcade.SpriteList(is_static=self.is_static)
+        self.chunks[sprite.chunk].append(sprite)
+
+    def unplace(self, sprite):
+        """ Takes a sprite out of its chunk, dropping the chunk once it is empty """
+        sprite.remove_from_sprite_lists()
+        if len(self.chunks.get(sprite.chunk, ())) == 0:
+            self.chunks.pop(sprite.chunk, None)
+
+    def remember(self):
+        """ Keeps where every entity is before a tick """
+        for entity in self.entity_list:
+            entity.sprite.last_x = entity.center_x
+            entity.sprite.last_y = entity.center_y
+
+    def sync(self, alpha=1):
+        """
+        Moves every sprite alpha of the way from where its entity was before
+        the last tick to where it is, changing chunks if it crossed into another
+        """
+        for entity in self.entity_list:
+            sprite = entity.sprite
+            sprite.center_x = sprite.last_x + (entity.center_x - sprite.last_x) * alpha
+            sprite.center_y = sprite.last_y + (entity.center_y - sprite.last_y) * alpha
+            if int(sprite.center_x // CHUNK_WIDTH) != sprite.chunk:
+                self.unplace(sprite)
+                self.place(sprite)
+
+    def draw(self, view_left):
+        """ Draws the chunks on screen, and one more each side for sprites hanging over their edge """
+        first = int(view_left // CHUNK_WIDTH) - 1
+        last = int((view_left + SCREEN_WIDTH) // CHUNK_WIDTH) + 1
+        for chunk in range(first, last + 1):
+            if chunk in self.chunks:
+                self.chunks[chunk].draw()
+
+
+# Baked images need names of their own, or arcade would take them for each other
+_bake_count = itertools.count()
+
+
+class BakedLayer(SpriteLayer):
+    """
+    A static layer drawn as one baked image per chunk. The image is put
+    together from the chunk's sprite textures on the CPU, so baking needs
+    no GL context and can run on the prefetch thread. When an entity
+    leaves, like the door opening, its chunk is baked again before it is
+    next drawn.
+    """
+    def __init__(self, entity_list, make_sprite):
+        self.chunk_sprites = {}
+        self.dirty = set()
+        super().__init__(entity_list, make_sprite, is_static=True)
+        self.rebuild()
+
+    def place(self, sprite):
+        sprite.chunk = int(sprite.center_x // CHUNK_WIDTH)
+        self.chunk_sprites.setdefault(sprite.chunk, []).append(sprite)
+        self.dirty.add(sprite.chunk)
+
+    def removed(self, entity):
+        chunk = entity.sprite.chunk
+        self.chunk_sprites[chunk].remove(entity.sprite)
+        if not self.chunk_sprites[chunk]:
+            del self.chunk_sprites[chunk]
+        self.dirty.add(chunk)
+
+    def remember(self):
+        """ Nothing in a static layer moves """
+
+    def sync(self, alpha=1):
+        """ Nothing in a static layer moves """
+
+    def rebuild(self):
+        """ Bakes every chunk that changed since it was last baked """
+        for chunk in self.dirty:
+            self.bake(chunk)
+        self.dirty = set()
+
+    def bake(self, chunk):
+        """ Draws a chunk's sprites into one image, and a sprite to show it """
+        self.chunks.pop(chunk, None)
+        sprites = self.chunk_sprites.get(chunk)
+        if not sprites:
+            return
+
+        # Where each sprite's image goes, in level coordinates
+        placed = []
+        for sprite in sprites:
+            image = sprite.texture.image
+            if sprite.scale != 1:
+                image = image.resize((round(image.width * sprite.scale), round(image.height * sprite.scale)))
+            placed.append((image, round(sprite.center_x - image.width / 2), round(sprite.center_y + image.height / 2)))
+        left = min(x for image, x, y in placed)
+        top = max(y for image, x, y in placed)
+        right = max(x + image.width for image, x, y in placed)
+        bottom = min(y - image.height for image, x, y in placed)
+
+        # Images count down from the top, the level counts up from the bottom
+        baked_image = PIL.Image.new("RGBA", (right - left, top - bottom))
+        for image, x, y in placed:
+            baked_image.alpha_composite(image.convert("RGBA"), (x - left, top - y))
+
+        baked = arcade.Sprite(center_x = (left + right) / 2, center_y = (bottom + top) / 2)
+        baked.texture = arcade.Texture(f"baked_{next(_bake_count)}", baked_image, hit_box_algorithm = "None")
+        self.chunks[chunk] = arcade.SpriteList(is_static=True)
+        self.chunks[chunk].append(baked)
+
+    def draw(self, view_left):
+        if self.dirty:
+            self.rebuild()
+        super().draw(view_left)
+
+
+class HudText:
+    """
+    Text drawn from a sprite that is only rasterized again when the text
+    changes, where arcade.draw_text looks it up in its cache every frame.
+    Like draw_text, (x, y) is the bottom left corner.
+    """
+    def __init__(self, x, y, font_size, color=arcade.csscolor.WHITE):
+        self.x = x
+        self.y = y
+        self.font_size = font_size
+        self.color = color
+        self.text = None
+        self.sprite_list = None
+
+    def set(self, text):
+        if text == self.text:
+            return
+        self.text = text
+        image = arcade.get_text_image(text = text, text_color = self.color, font_size = self.font_size)
+        sprite = arcade.Sprite(center_x = self.x + image.width / 2, center_y = self.y + image.height / 2)
+        sprite.texture = arcade.Texture(f"text_{self.color}_{self.font_size}_{text}", image, hit_box_algorithm = "None")
+
+        # A new list, as a SpriteList keeps every texture it has ever shown
+        self.sprite_list = arcade.SpriteList()
+        self.sprite_list.append(sprite)
+
+    def draw(self):
+        self.sprite_list.draw()
+
+
+class Hud:
+    """ Lives, score, enemies left and bullets, drawn in screen coordinates """
     def __init__(self):
-        
+        self.heart = assets.texture("sprites/heart.png")
+        self.score_enemy = assets.texture("sprites/scoretext.png")
+        self.bullets_text = assets.texture("sprites/bulletstext.png")
+        self.boss_text = assets.texture("sprites/bosstext.png")
+
+        self.lives = HudText(60, SCREEN_HEIGHT - 53, 35)
+        self.score = HudText(SCREEN_WIDTH - 45, SCREEN_HEIGHT - 40, 27)
+        self.enemies_left = HudText(SCREEN_WIDTH - 48, SCREEN_HEIGHT - 83, 27)
+        self.bullets_left = HudText(SCREEN_WIDTH - 48, SCREEN_HEIGHT - 120, 27)
+
+    def draw(self, simulation):
+        arcade.draw_lrwh_rectangle_textured(0, SCREEN_HEIGHT - 60, 64, 64, self.heart)
+        arcade.draw_lrwh_rectangle_textured(450, SCREEN_HEIGHT - 110, 302, 126, self.score_enemy)
+
+        self.lives.set(f": {simulation.lives}")
+        self.lives.draw()
+        self.score.set(f"{simulation.score}")
+        self.score.draw()
+        self.enemies_left.set(f"{simulation.enemies_left}")
+        self.enemies_left.draw()
+        if simulation.bullet_amount >= 1:
+            arcade.draw_lrwh_rectangle_textured(450, SCREEN_HEIGHT - 150, 302, 126, self.bullets_text)
+            self.bullets_left.set(f"{simulation.bullet_amount}")
+            self.bullets_left.draw()
+        if simulation.player.center_x >= 37 * SCALED_TILE_SIZE and simulation.level == 6:
+            arcade.draw_lrwh_rectangle_textured(250, SCREEN_HEIGHT - 550, 302, 126, self.boss_text)
+
+
+class ProfilerOverlay:
+    """ The profiler's frame time and time in each zone, drawn down the left of the screen """
+    def __init__(self, profiler):
+        self.profiler = profiler
+        self.lines = []
+        self.refreshed_at = None
+        self.message = None
+
+    def show(self, message):
+        """ Adds a line under the timings, such as where a trace was saved """
+        self.message = message
+        self.refreshed_at = None
+
+    def draw(self):
+        # Only redrawn every so often, as new text has to be rasterized
+        if self.refreshed_at is None or self.profiler.frame_count - self.refreshed_at >= OVERLAY_REFRESH:
+            self.refresh()
+        for line in self.lines:
+            line.draw()
+
+    def refresh(self):
+        mean, worst, zones = self.profiler.summary(OVERLAY_FRAMES)
+        texts = [f"frame {mean * 1000:.2f} ms, worst {worst * 1000:.2f} ms"]
+        for name, zone_time, depth in zones:
+            texts.append(f"{'    ' * depth}{name} {zone_time * 1000:.2f} ms")
+        if self.message is not None:
+            texts.append(self.message)
+        while len(self.lines) < len(texts):
+            self.lines.append(HudText(10, SCREEN_HEIGHT - 90 - 18 * len(self.lines), 11))
+        del self.lines[len(texts):]
+        for line, text in zip(self.lines, texts):
+            line.set(text)
+        self.refreshed_at = self.profiler.frame_count
+
+
+class GameView(arcade.View):
+    """
+    Draws the game and feeds it input. The rules live in GameSimulation.
+    With prefetch, the next level is built on a worker thread during play.
+    """
+    def __init__(self, prefetch=True):
+
         # Call parent class
         super().__init__()
 
-        # Used for scrolling map
-        self.view_left = 0
-        self.view_bottom = 0
-        
         # Set background and headings
-        self.background = arcade.load_texture("sprites/level_1.png")
-        self.heart = arcade.load_texture("sprites/heart.png")
-        self.score_enemy = arcade.load_texture("sprites/scoretext.png")
-        self.bullets_text = arcade.load_texture("sprites/bulletstext.png")
-        self.boss_text = arcade.load_texture("sprites/bosstext.png")
+        self.background = assets.texture("sprites/level_1.png")
+        self.hud = Hud()
         arcade.set_background_color((138, 204, 255))
-        
-        # Lists
-        self.wall_list = arcade.SpriteList()
-        self.titan_list = arcade.SpriteList()
-        self.coin_list = arcade.SpriteList()
-        self.door_list = arcade.SpriteList()
-        self.door_opened_list = arcade.SpriteList()
-        self.health_potion_list = arcade.SpriteList()
-        self.strength_potion_list = arcade.SpriteList()
-        self.lava_list = arcade.SpriteList()
-        self.gun_list = arcade.SpriteList()
-        self.enemy_bullet_list = arcade.SpriteList()
-        self.police_list = arcade.SpriteList()
-        self.boss_list = arcade.SpriteList
-        
+
         # PLAYER
-        self.player_list = arcade.SpriteList()
         self.player_sprite = arcade.AnimatedTimeSprite()
-        self.attack_list = arcade.SpriteList()
-        self.player_sprite.textures = []
-        self.player_attack_dmg = 1
-        self.player_faces_left = 0
-        self.bullet_list = arcade.SpriteList()
-        self.bullet_amount = 0
-        self.lives = 5
-        self.score = 0
-        self.attack_cooldown = 0.0
-        self.dmg_cooldown = 0.0
-        self.potion_time = 0.0
-        self.enemies_left = 0
-        self.enemy_shoot_cooldown = 0.0
-        self.frame_count = 0
-
-        # Set up player
-        self.player_sprite.center_x = 4 * SCALED_TILE_SIZE
-        self.player_sprite.center_y = -7 * SCALED_TILE_SIZE
-        self.player_list.append(self.player_sprite)
-        self.player_sprite.textures.append(arcade.load_texture("sprites/spritesheet.png", x = 0, y = 0, width = 64, height = 64))
-        
+        self.player_animation = None
+
         #---SOUNDS---
-        # SOURCE: Super Mario Bros.
-        self.coin_sound = arcade.load_sound("sounds/smb_coin.wav")
-        self.jump_sound = arcade.load_sound("sounds/smb_jump-small.wav")
-        self.getting_gun = arcade.load_sound("sounds/gunget.wav")
-        self.game_over = arcade.load_sound("sounds/smb3_player_down.wav")
-        self.strength_sound = arcade.load_sound("sounds/smb3_power-up.wav") 
-        self.health_sound = arcade.load_sound("sounds/smw2_1-up.wav") 
-        self.pew = arcade.load_sound("sounds/ssbm_peach_05.wav") 
-        self.attack_sound = arcade.load_sound("sounds/ssbm_peach_04.wav")
-        self.ow = arcade.load_sound("sounds/ssbm_peach_16.wav") 
-        self.next_level_sound = arcade.load_sound("sounds/smb2_bonus_chance_start.wav")
-        self.boss_sound = arcade.load_sound("sounds/smb2_bonus_chance_win.wav")
-        # SOURCE: Minecraft
-        self.fire_sound = arcade.load_sound("sounds/fire.ogg")
-        self.door_sound = arcade.load_sound("sounds/open2.ogg") ##
-        self.titan_hurt_sound = arcade.load_sound("sounds/hurt3.ogg") 
-        self.titan_death_sound = arcade.load_sound("sounds/death2.ogg") 
-        self.police_hurt_sound = arcade.load_sound("sounds/hurt4.ogg")
-        self.police_death_sound = arcade.load_sound("sounds/death5.ogg")
-        # SOURCE: zatplat.com
-        self.win = arcade.load_sound("sounds/win.mp3")
-        
-        # Load levels
-        self.level = 1
-        self.load_level(self.level)
-        
-    def load_level(self, level):
-        """ Create maps based on level """
-        #---LEVEL 1---
-        if self.level == 1:
-            map_array = get_map("maps/level_1.csv")
-            
-            # Create Enemies
-            self.enemies_left = 4
-            titan = Enemy("sprites/titan.png", SPRITE_SCALING)
-            titan.attributes(14, -7, 1, 2, 6) 
-            self.titan_list.append(titan)
-            titan = Enemy("sprites/titan.png", SPRITE_SCALING)
-            titan.attributes(22, -6, 1, 1, 6) 
-            self.titan_list.append(titan)
-            titan = Enemy("sprites/titan.png", SPRITE_SCALING)
-            titan.attributes(39, -7, 1, 2, 6) 
-            self.titan_list.append(titan) 
-            titan = Enemy("sprites/titan.png", SPRITE_SCALING)
-            titan.attributes(50, -10, 1, 4, 6) 
-            self.titan_list.append(titan)
-            
-        #---LEVEL 2 ---
-        if self.level == 2:
-            map_array = get_map("maps/level_2.csv")
-            
-            # Create Enemies
-            self.enemies_left = 5
-            titan = Enemy("sprites/titan.png", SPRITE_SCALING)
-            titan.attributes(22, -6, 1, 1, 6)
-            self.titan_list.append(titan)
-            titan = Enemy("sprites/titan.png", SPRITE_SCALING)
-            titan.attributes(16, -4, 1, 2, 6) 
-            self.titan_list.append(titan)
-            titan = Enemy("sprites/titan.png", SPRITE_SCALING)
-            titan.attributes(39, -7, 1, 2, 6) 
-            self.titan_list.append(titan)
-            titan = Enemy("sprites/titan.png", SPRITE_SCALING)
-            titan.attributes(27, -10, 1, 2, 6) 
-            self.titan_list.append(titan)
-            titan = Enemy("sprites/titan.png", SPRITE_SCALING)
-            titan.attributes(50, -7, 1, 2, 6) 
-            self.titan_list.append(titan)          
-        
-        #---LEVEL 3---
-        if self.level == 3:
-            map_array = get_map("maps/level_3.csv")
-            
-            # Create Enemies
-            self.enemies_left = 6
-            titan = Enemy("sprites/titan.png", SPRITE_SCALING)
-            titan.attributes(14, -9, 1, 1, 6)
-            self.titan_list.append(titan)  
-            titan = Enemy("sprites/abnormal.png", SPRITE_SCALING)
-            titan.attributes(24, -6, 3, 2, 8)
-            self.titan_list.append(titan)
-            titan = Enemy("sprites/titan.png", SPRITE_SCALING)
-            titan.attributes(32, -7, 1, 2, 6)
-            self.titan_list.append(titan)
-            titan = Enemy("sprites/abnormal.png", SPRITE_SCALING)
-            titan.attributes(31, -7, 3, 3, 8)
-            self.titan_list.append(titan)
-            titan = Enemy("sprites/abnormal.png", SPRITE_SCALING)
-            titan.attributes(39, -7, 3, 2, 6) 
-            self.titan_list.append(titan)
-            titan = Enemy("sprites/titan.png", SPRITE_SCALING)
-            titan.attributes(50, -7, 1, 2, 8) 
-            self.titan_list.append(titan)
-        
-        #---LEVEL 4---
-        if self.level == 4:
-            map_array = get_map("maps/level_4.csv")
-            
-            # Create Enemies
-            self.enemies_left = 8
-            titan = Enemy("sprites/abnormal.png", SPRITE_SCALING)
-            titan.attributes(24, -8, 3, 2, 8)
-            self.titan_list.append(titan)
-            titan = Enemy("sprites/abnormal.png", SPRITE_SCALING)
-            titan.attributes(31, -7, 3, 3, 8)
-            self.titan_list.append(titan)
-            titan = Enemy("sprites/titan.png", SPRITE_SCALING)
-            titan.attributes(8, -7, 1, 4, 6)
-            self.titan_list.append(titan)
-            titan = Enemy("sprites/abnormal.png", SPRITE_SCALING)
-            titan.attributes(8, -7, 3, 4, 8)
-            self.titan_list.append(titan)            
-            titan = Enemy("sprites/titan.png", SPRITE_SCALING)
-            titan.attributes(51, -4, 1, 1, 6)
-            self.titan_list.append(titan)
-            titan = Enemy("sprites/titan.png", SPRITE_SCALING)
-            titan.attributes(45, -7, 1, 1, 6)
-            self.titan_list.append(titan)
-            titan = Enemy("sprites/abnormal.png", SPRITE_SCALING)
-            titan.attributes(42.5, -6, 3, 1.5, 8)
-            self.titan_list.append(titan)
-            titan = Enemy("sprites/titan.png", SPRITE_SCALING)
-            titan.attributes(59.5, -5, 1, 1.5, 6)
-            self.titan_list.append(titan)
-         
-        #---LEVEL 5---  
-        if self.level == 5:
-            map_array = get_map("maps/level_5.csv")
-            
-            # Create Enemies
-            self.enemies_left = 8
-            police = Enemy("sprites/police.png", SPRITE_SCALING)
-            police.attributes(23.5, -7.6, 0, 0, 6)
-            self.police_list.append(police)
-            police = Enemy("sprites/police.png", SPRITE_SCALING)
-            police.attributes(10, -7.6, 2, 1, 6)
-            self.police_list.append(police)
-            titan = Enemy("sprites/titan.png", SPRITE_SCALING)
-            titan.attributes(13.5, -9, 1, 1.5, 6)
-            self.titan_list.append(titan)
-            titan = Enemy("sprites/titan.png", SPRITE_SCALING)
-            titan.attributes(19, -8, 1, 1, 6)
-            self.titan_list.append(titan)
-            police = Enemy("sprites/police.png", SPRITE_SCALING)
-            police.attributes(31, -7.6, 2, 3, 6)
-            self.police_list.append(police)
-            titan = Enemy("sprites/abnormal.png", SPRITE_SCALING)
-            titan.attributes(31, -7, 3, 3, 8)
-            self.titan_list.append(titan)
-            police = Enemy("sprites/police.png", SPRITE_SCALING)
-            police.attributes(44, -5.6, 2, 1, 6)
-            self.police_list.append(police)
-            titan = Enemy("sprites/abnormal.png", SPRITE_SCALING)
-            titan.attributes(51, -4, 3, 1, 8)
-            self.titan_list.append(titan)            
-        
-        #---LEVEL 6---
-        if self.level == 6:
-            map_array = get_map("maps/level_6.csv")
-            
-            # Create Enemies
-            self.enemies_left = 7
-            police = Enemy("sprites/police.png", SPRITE_SCALING)
-            police.attributes(11, -5.6, 2, 1, 6)
-            self.police_list.append(police) 
-            titan = Enemy("sprites/abnormal.png", SPRITE_SCALING)
-            titan.attributes(18, -4, 3, 2, 8)
-            self.titan_list.append(titan)
-            titan = Enemy("sprites/titan.png", SPRITE_SCALING)
-            titan.attributes(17, -4, 1, 2, 6)
-            self.titan_list.append(titan)
-            police = Enemy("sprites/police.png", SPRITE_SCALING)
-            police.attributes(16, -7.6, 2, 4, 6)
-            self.police_list.append(police)
-            police = Enemy("sprites/police.png", SPRITE_SCALING)
-            police.attributes(19, -7.6, -2, 4, 6)
-            self.police_list.append(police)
-            titan = Enemy("sprites/abnormal.png", SPRITE_SCALING)
-            titan.attributes(23, -7, 3, 4, 6)
-            self.titan_list.append(titan)
-            
-            # BOSS
-            titan = Enemy("sprites/bert.png", SPRITE_SCALING * 1.5)
-            titan.attributes(45, -5.2, 5, 6, 30)
-            self.titan_list.append(titan)        
-    
-        for row_index in range(len(map_array)):
-            for column_index in range(len(map_array[row_index])):
-                wall = arcade.Sprite()
-                coin = arcade.Sprite()
-                titan = arcade.Sprite()
-                door_opened = arcade.Sprite()
-                door = arcade.Sprite()
-                health_potion = arcade.Sprite()
-                lava = arcade.Sprite()
-                strength_potion = arcade.Sprite()
-                gun = arcade.Sprite()
-        
-                item = map_array[row_index][column_index]
-        
-                # Wall items
-                if item == 1:
-                    wall.texture = arcade.load_texture("sprites/spritesheet.png", x = 64, y = 512, width = 64, height = 64)
-                elif item == 2:
-                    wall.texture = arcade.load_texture("sprites/spritesheet.png", x = 64, y = 448, width = 64, height = 64)
-                elif item == 3:
-                    wall.texture = arcade.load_texture("sprites/spritesheet.png", x = 0, y = 512, width = 64, height = 64)
-                elif item == 4:
-                    wall.texture = arcade.load_texture("sprites/spritesheet.png", x = 128, y = 512, width = 64, height = 64)
-                elif item == 5:
-                    wall.texture = arcade.load_texture("sprites/spritesheet.png", x = 0, y = 448, width = 64, height = 64)
-                elif item == 6:
-                    wall.texture = arcade.load_texture("sprites/spritesheet.png", x = 128, y = 448, width = 64, height = 64)
-        
-                if item >= 1 and item < 7:
-                    # Calculate where the sprite goes
-                    wall.left = column_index * SCALED_TILE_SIZE
-                    wall.top = (MAP_HEIGHT - row_index) * SCALED_TILE_SIZE
-        
-                    # Add the sprite
-                    self.wall_list.append(wall)
-                
-                # Special Items
-                if item == 7:
-                    coin.texture = arcade.load_texture("sprites/spritesheet.png", x = 64, y = 256, width = 64, height = 64)
-                    coin.left = column_index * SCALED_TILE_SIZE + 15
-                    coin.top = (MAP_HEIGHT - row_index) * SCALED_TILE_SIZE - 15
-                    self.coin_list.append(coin)
-                    
-                if item == 8:
-                    door_opened.texture = arcade.load_texture("sprites/spritesheet.png", x = 128, y = 576, width = 64, height = 64)
-                    door_opened.left = column_index * SCALED_TILE_SIZE
-                    door_opened.top = (MAP_HEIGHT - row_index) * SCALED_TILE_SIZE
-                    self.door_opened_list.append(door_opened)  
-                    door.texture = arcade.load_texture("sprites/spritesheet.png", x = 192, y = 640, width = 64, height = 64)
-                    door.left = column_index * SCALED_TILE_SIZE
-                    door.top = (MAP_HEIGHT - row_index) * SCALED_TILE_SIZE
-                    self.door_list.append(door)
-                
-                if item == 9:
-                    health_potion.texture = arcade.load_texture("sprites/spritesheet.png", x = 128, y = 256, width = 64, height = 64)
-                    health_potion.left = column_index * SCALED_TILE_SIZE + 16
-                    health_potion.top = (MAP_HEIGHT - row_index) * SCALED_TILE_SIZE - 15
-                    self.health_potion_list.append(health_potion)
-                
-                if item == 10:
-                    lava.texture = arcade.load_texture("sprites/spritesheet.png", x = 192, y = 448, width = 64, height = 64)
-                    lava.left = column_index * SCALED_TILE_SIZE
-                    lava.top = (MAP_HEIGHT - row_index) * SCALED_TILE_SIZE - 22
-                    self.lava_list.append(lava)
-                
-                if item == 11:
-                    strength_potion.texture = arcade.load_texture("sprites/spritesheet.png", x = 192, y = 256, width = 64, height = 64)
-                    strength_potion.left = column_index * SCALED_TILE_SIZE + 16
-                    strength_potion.top = (MAP_HEIGHT - row_index) * SCALED_TILE_SIZE - 15
-                    self.strength_potion_list.append(strength_potion)
-                
-                if item == 12:
-                    gun.texture = arcade.load_texture("sprites/spritesheet.png", x = 128, y = 640, width = 64, height = 64)
-                    gun.left = column_index * SCALED_TILE_SIZE 
-                    gun.top = (MAP_HEIGHT - row_index) * SCALED_TILE_SIZE - 25
-                    self.gun_list.append(gun)                
-    
-        # Create out platformer physics engine with gravity
-        self.physics_engine = arcade.PhysicsEnginePlatformer(self.player_sprite,
-                                                             self.wall_list, gravity_constant=GRAVITY)
-        
+        self.sounds = {name: assets.sound(filename) for name, filename in GAME_SOUNDS.items()}
+
+        # Times each part of a frame, while turned on with PROFILER_KEY
+        self.profiler = Profiler()
+        self.profiler_overlay = None
+
+        # Game rules, and the input waiting for its next step
+        self.simulation = GameSimulation(prefetch=prefetch, prepare_scene=self.prepare_scene, profiler=self.profiler,
+                                         **GAME_SETTINGS)
+        self.inputs = []
+        self.set_player_animation(self.simulation.player_animation)
+        self.recorder = None
+        if REPLAY_FILE:
+            # A replay that can't be written isn't worth stopping the game for
+            try:
+                self.recorder = Recorder(self.simulation, REPLAY_FILE)
+            except OSError:
+                pass
+
+        # The game ticks at a fixed rate, and frames are drawn between ticks
+        self.timestep = FixedTimestep()
+        self.last_view = (self.simulation.view_left, self.simulation.view_bottom)
+        self.view_left = self.simulation.view_left
+        self.view_bottom = self.simulation.view_bottom
+        self.teleported = False
+
+        # Lists that last the whole game
+        self.enemy_bullet_list = SpriteLayer(self.simulation.enemy_bullet_list, self.make_sprite)
+        self.player_list = SpriteLayer(self.simulation.player_list, self.make_sprite)
+        self.attack_list = SpriteLayer(self.simulation.attack_list, self.make_sprite)
+        self.bullet_list = SpriteLayer(self.simulation.bullet_list, self.make_sprite)
+
+        # Lists of the level being played, replaced with each scene
+        self.simulation.scene_listeners.append(self)
+        self.scene_changed(None, self.simulation.scene)
+
+    def prepare_scene(self, scene):
+        """ Makes the sprite lists for a level's scene, on the prefetch thread if there is one """
+        scene.sprite_layers = {}
+        for list_name in LEVEL_LIST_NAMES:
+            entity_list = getattr(scene, list_name)
+            if BAKE_STATIC_LAYERS and list_name in BAKED_LIST_NAMES:
+                scene.sprite_layers[list_name] = BakedLayer(entity_list, self.make_sprite)
+            else:
+                scene.sprite_layers[list_name] = SpriteLayer(entity_list, self.make_sprite,
+                                                             list_name in STATIC_LIST_NAMES)
+
+    def scene_changed(self, old_scene, scene):
+        """ Draws the new scene's sprite lists, letting the old ones go with their scene """
+        if scene.sprite_layers is None:
+            self.prepare_scene(scene)
+        for list_name, layer in scene.sprite_layers.items():
+            setattr(self, list_name, layer)
+
+        # Only these lists have entities that move
+        self.moving_layers = [self.player_list, self.titan_list, self.police_list,
+                              self.attack_list, self.bullet_list, self.enemy_bullet_list]
+
+        # The player is moved to the new level's start, which mustn't be drawn as a slide
+        self.teleported = True
+
+    def make_sprite(self, entity):
+        """ Creates the sprite that draws an entity """
+        if entity.texture == "player":
+            sprite = self.player_sprite
+        elif entity.texture == "door":
+            sprite = arcade.Sprite()
+            sprite.texture = get_tileset().door
+        elif isinstance(entity.texture, int):
+            sprite = arcade.Sprite()
+            sprite.texture = get_tileset()[entity.texture]
+        else:
+            sprite = arcade.Sprite(scale = entity.scale)
+            sprite.texture = assets.texture(entity.texture)
+        return sprite
+
+    def set_player_animation(self, animation):
+        """ Swaps the player's frames when the simulation changes animation """
+        if animation == self.player_animation:
+            return
+        self.player_animation = animation
+        y, frames = PLAYER_ANIMATIONS[animation]
+        self.player_sprite.textures = []
+        for i in range(frames):
+            self.player_sprite.textures.append(assets.texture("sprites/spritesheet.png", x = i*64, y = y, width = 64, height = 64))
+
     def on_draw(self):
         """ Render screen and draw everything """
         arcade.start_render()
-        
-        # Draw all sprites
-        self.wall_list.draw()
-        self.titan_list.draw()
-        self.coin_list.draw()
-        self.health_potion_list.draw()
-        self.strength_potion_list.draw()
-        self.door_list.draw()
-        self.bullet_list.draw()
-        self.gun_list.draw()
-        self.player_list.draw()
-        self.attack_list.draw()
-        self.lava_list.draw()
-        self.enemy_bullet_list.draw()
-        self.police_list.draw()
+        simulation = self.simulation
+        view_left = self.view_left
+        view_bottom = self.view_bottom
+        arcade.set_viewport(view_left, SCREEN_WIDTH + view_left - 1, view_bottom, SCREEN_HEIGHT + view_bottom - 1)
+        profiler = self.profiler
+
+        # Draw the sprites on screen
+        profiler.start("draw")
+        for list_name in DRAW_ORDER:
+            profiler.start(list_name)
+            getattr(self, list_name).draw(view_left)
+            profiler.stop()
 
         # Draw the opened door once all enemies are gone
-        if self.enemies_left == 0:
-            self.door_opened_list.draw()
-        
-        # Draw text on screen, scrolling it with the viewport
-        arcade.draw_lrwh_rectangle_textured(self.view_left, SCREEN_HEIGHT - 60 + self.view_bottom, 64, 64, self.heart)
-        arcade.draw_lrwh_rectangle_textured(450 + self.view_left, SCREEN_HEIGHT - 110 + self.view_bottom, 302, 126, self.score_enemy)
-        
-        lives_text = f": {self.lives}"
-        arcade.draw_text(lives_text,  60 + self.view_left, SCREEN_HEIGHT - 53 + self.view_bottom,
-                         arcade.csscolor.WHITE, 35)
-        score_text = f"{self.score}"
-        arcade.draw_text(score_text, SCREEN_WIDTH - 45 + self.view_left, SCREEN_HEIGHT - 40 + self.view_bottom,
-                         arcade.csscolor.WHITE, 27)
-        enemies_left_text = f"{self.enemies_left}"
-        arcade.draw_text(enemies_left_text, SCREEN_WIDTH - 48 + self.view_left, SCREEN_HEIGHT - 83 + self.view_bottom,
-                         arcade.csscolor.WHITE, 27)
-        if self.bullet_amount >= 1:
-            arcade.draw_lrwh_rectangle_textured(450 + self.view_left, SCREEN_HEIGHT - 150 + self.view_bottom, 302, 126, self.bullets_text)
-            bullets_left = f"{self.bullet_amount}"
-            arcade.draw_text(bullets_left, SCREEN_WIDTH - 48 + self.view_left, SCREEN_HEIGHT - 120 + self.view_bottom,
-                         arcade.csscolor.WHITE, 27)
-        if self.player_sprite.center_x >= 37 * SCALED_TILE_SIZE and self.level == 6:
-            arcade.draw_lrwh_rectangle_textured(250 + self.view_left, SCREEN_HEIGHT - 550 + self.view_bottom, 302, 126, self.boss_text)
-        
+        if simulation.enemies_left == 0:
+            profiler.start("door_opened_list")
+            self.door_opened_list.draw(view_left)
+            profiler.stop()
+        profiler.stop()
+
+        # Draw text on screen, which stays put while the level scrolls
+        arcade.set_viewport(0, SCREEN_WIDTH - 1, 0, SCREEN_HEIGHT - 1)
+        profiler.start("hud")
+        self.hud.draw(simulation)
+        profiler.stop()
+        if self.profiler_overlay is not None:
+            self.profiler_overlay.draw()
+        profiler.end_frame()
+
     def update(self, delta_time):
-        """ Movement and game logic """
-        # Call update on all sprites
-        self.player_list.update()
-        self.player_list.update_animation()
-        self.coin_list.update()
-        self.titan_list.update()
-        self.attack_list.update()
-        self.bullet_list.update()
-        self.door_list.update()
-        self.door_opened_list.update()
-        self.wall_list.update()
-        self.health_potion_list.update()
-        self.strength_potion_list.update()
-        self.lava_list.update()
-        self.police_list.update()
-        self.enemy_bullet_list.update()
-        self.dmg_cooldown += delta_time
-        self.attack_cooldown += delta_time
-        self.potion_time += delta_time
-        self.frame_count += 1
-
-        # ENEMY UPDATES
-        for titan in self.titan_list:
-            titan.enemy_update()
-        for police in self.police_list:
-            police.enemy_update()
-            police.shooting_update(self.player_sprite, self.enemy_bullet_list, self.frame_count)
-        
-        # If enemy touches a player, remove one life
-        enemy_hit_list = arcade.check_for_collision_with_list(self.player_sprite, self.titan_list)
-        if self.dmg_cooldown >= 2:
-            for titan in enemy_hit_list:
-                arcade.play_sound(self.ow)
-                self.lives -= 1
-                if self.score >= 5:
-                    self.score -= 5
-                self.dmg_cooldown = 0
-            
-        # If enemy's health hits 0, remove
-        for titan in self.titan_list:
-            if titan.enemy_health <= 0:
-                arcade.play_sound(self.titan_death_sound)
-                titan.remove_from_sprite_lists()
-                self.enemies_left -= 1
-        for police in self.police_list:
-            if police.enemy_health <= 0:
-                arcade.play_sound(self.police_death_sound)
-                police.remove_from_sprite_lists()
-                self.enemies_left -= 1 
-                
-        enemy_bullet_hit_list = arcade.check_for_collision_with_list(self.player_sprite, self.enemy_bullet_list)
-        
-        if self.dmg_cooldown >= 2:
-            for bullet in enemy_bullet_hit_list:
-                arcade.play_sound(self.ow)
-                self.lives -= 1
-                
-                if len(enemy_bullet_hit_list) > 0:
-                    bullet.remove_from_sprite_lists()                
-                
-                if self.score >= 5:
-                    self.score -= 5
-                self.dmg_cooldown = 0
-            
-        for bullet in self.enemy_bullet_list:
-            enemy_bullet_wall_list = arcade.check_for_collision_with_list(bullet, self.wall_list)
-            
-            if len(enemy_bullet_wall_list) > 0:
-                bullet.remove_from_sprite_lists()               
-            
-            #If the bullet flies off-screen, remove it.
-            if bullet.bottom > 0 or bullet.top < -1200 or bullet.right < 0 or bullet.left > (800 + self.view_left):
-                bullet.remove_from_sprite_lists() 
-        
-        # Play sound if in boss arena
-        if self.player_sprite.center_x == 37 * SCALED_TILE_SIZE and self.level == 6:
-            arcade.play_sound(self.boss_sound)
-        
-        # LAVA UPDATES
-        lava_hit_list = arcade.check_for_collision_with_list(self.player_sprite, self.lava_list)
-        if self.dmg_cooldown >= 2:
-            for lava in lava_hit_list:
-                arcade.play_sound(self.fire_sound)
-                arcade.play_sound(self.ow)
-                self.lives -= 1
-                if self.score >= 5:
-                    self.score -= 5
-                self.dmg_cooldown = 0
-    
-        # ATTACKS
-        for attack in self.attack_list:
-            # Check if attack hits an enemy
-            attack_hit_list = arcade.check_for_collision_with_list(attack, self.titan_list)
-            attack_hit_list_2 = arcade.check_for_collision_with_list(attack, self.police_list)       
-            
-            # Get rid of attack
-            if len(attack_hit_list) > 0:
-                attack.remove_from_sprite_lists()
-            if len(attack_hit_list_2) > 0:
-                attack.remove_from_sprite_lists()
-            if self.attack_cooldown >= 1:
-                attack.remove_from_sprite_lists()
-                self.attack_cooldown = 0
-               
-            # For every titan we hit, decrease its health
-            for titan in attack_hit_list:
-                arcade.play_sound(self.titan_hurt_sound)
-                titan.enemy_health -= self.player_attack_dmg
-            for police in attack_hit_list_2:
-                arcade.play_sound(self.police_hurt_sound)
-                police.enemy_health -= self.player_attack_dmg
-            
-        # GUN UPDATES
-        gun_hit_list = arcade.check_for_collision_with_list(self.player_sprite, self.gun_list)
-        for gun in gun_hit_list:
-            gun.remove_from_sprite_lists()
-            arcade.play_sound(self.getting_gun)
-            
-            # Add 10 bullets for every gun we touch
-            self.bullet_amount += 10
-        
-        for bullet in self.bullet_list:
-            # Check if bullet hits enemy
-            bullet_hit_list = arcade.check_for_collision_with_list(bullet, self.titan_list)
-            bullet_hit_list_2 = arcade.check_for_collision_with_list(bullet, self.police_list)
-            bullet_wall_list = arcade.check_for_collision_with_list(bullet, self.wall_list)
-            
-            #For every titan we hit, decrease health
-            for titan in bullet_hit_list:
-                arcade.play_sound(self.titan_hurt_sound)
-                titan.enemy_health -= self.player_attack_dmg
-            for police in bullet_hit_list_2:
-                arcade.play_sound(self.police_hurt_sound)
-                police.enemy_health -= self.player_attack_dmg
-                    
-            # Get rid of attack
-            if len(bullet_hit_list) > 0:
-                bullet.remove_from_sprite_lists()
-            if len(bullet_hit_list_2) > 0:
-                bullet.remove_from_sprite_lists()
-            if len(bullet_wall_list) > 0:
-                bullet.remove_from_sprite_lists()            
-            
-            #If the bullet flies off-screen, remove it.
-            if bullet.bottom > 0 or bullet.top < -1200 or bullet.right < 0 or bullet.left > (800 + self.view_left):
-                bullet.remove_from_sprite_lists()         
-
-        # Score count/coin collisions list
-        coin_hit_list = arcade.check_for_collision_with_list(self.player_sprite, self.coin_list)
-        for coin in coin_hit_list:
-            arcade.play_sound(self.coin_sound)
-            coin.remove_from_sprite_lists()
-            self.score += 1
-        
-        # If player hits a potion, add to its stats
-        health_potion_hit_list = arcade.check_for_collision_with_list(self.player_sprite, self.health_potion_list)
-        for health_potion in health_potion_hit_list:
-            arcade.play_sound(self.health_sound) 
-            health_potion.remove_from_sprite_lists()
-            self.lives += 1
-        strength_potion_hit_list = arcade.check_for_collision_with_list(self.player_sprite, self.strength_potion_list)
-        for strength_potion in strength_potion_hit_list:
-            arcade.play_sound(self.strength_sound)             
-            strength_potion.remove_from_sprite_lists()
-            self.potion_time = 0
-            self.player_attack_dmg *= 2
-        if self.potion_time >= 10:
-            self.player_attack_dmg = 1
-        
-        # Door updates
-        door_opened_hit_list = arcade.check_for_collision_with_list(self.player_sprite, self.door_opened_list)
-        
-        # If all enemies are gone, "open" the door.
-        if self.enemies_left == 0:
-            for door in self.door_list:
-                arcade.play_sound(self.door_sound)
-                door.kill()
-            if self.level <= 5:
-                # When player touches opened door
-                for door_opened in door_opened_hit_list:
-                    for i in range(7):
-                        for wall in self.wall_list:
-                            wall.kill()                 
-                        for coin in self.coin_list:
-                            coin.kill()
-                        for door_opened in self.door_opened_list:
-                            door_opened.kill()
-                        for lava in self.lava_list:
-                            lava.kill()
-                        for gun in self.gun_list:
-                            gun.kill()
-                        for strength_potion in self.strength_potion_list:
-                            strength_potion.kill()
-                        for health_potion in self.health_potion_list:
-                            health_potion.kill()
-                            
-                    # Advance to next level
-                    self.level += 1
-                    arcade.play_sound(self.next_level_sound)
-                    self.load_level(self.level)
-                    self.player_sprite.center_x = 4 * SCALED_TILE_SIZE
-                    self.player_sprite.center_y = -8 * SCALED_TILE_SIZE
-                    
-            if self.level == 6:
-                for door_opened in door_opened_hit_list:
-                    arcade.play_sound(self.win)
-                    self.player_sprite.center_x = 216
-                    self.player_sprite.center_y = 382
-                    game_over_view = GameOverView()
-                    game_over_view.score = self.score
-                    self.window.show_view(game_over_view)                     
-        
-        # If player dies move to game over page
-        if self.lives <= 0:
-            arcade.play_sound(self.game_over)
-            self.player_sprite.center_x = 216
-            self.player_sprite.center_y = 382          
-            game_over_view = GameOverView()
-            game_over_view.score = self.score
-            self.window.show_view(game_over_view) 
-            
-        # --- Manage Scrolling ---
-        changed = False
-
-        # Scroll left
-        left_boundary = self.view_left + VIEWPORT_MARGIN
-        if self.player_sprite.left < left_boundary:
-            self.view_left -= left_boundary - self.player_sprite.left
-            changed = True
-
-        # Scroll right
-        right_boundary = self.view_left + SCREEN_WIDTH - RIGHT_MARGIN
-        if self.player_sprite.right > right_boundary:
-            self.view_left += self.player_sprite.right - right_boundary
-            changed = True
-
-        # Scroll up
-        top_boundary = self.view_bottom + SCREEN_HEIGHT - VIEWPORT_MARGIN
-        if self.player_sprite.top > top_boundary:
-            self.view_bottom += self.player_sprite.top - top_boundary
-            changed = True
-
-        # Scroll down
-        bottom_boundary = self.view_bottom + VIEWPORT_MARGIN
-        if self.player_sprite.bottom < bottom_boundary:
-            self.view_bottom -= bottom_boundary - self.player_sprite.bottom
-            changed = True
-        self.view_left = int(self.view_left)
-        self.view_bottom = int(self.view_bottom)
-
-        # If we changed the boundary values, update the view port to match
-        if changed:
-            arcade.set_viewport(self.view_left,
-                                SCREEN_WIDTH + self.view_left - 1,
-                                self.view_bottom,
-                                SCREEN_HEIGHT + self.view_bottom - 1)   
-            
-        # Restrict character from going beyond window borders
-        if self.player_sprite.center_x < 4 * SCALED_TILE_SIZE:
-            self.player_sprite.center_x = 4 * SCALED_TILE_SIZE
-        if self.player_sprite.center_x > 63 * SCALED_TILE_SIZE:
-            self.player_sprite.center_x = 63 * SCALED_TILE_SIZE
-        
-        # Update physics engine
-        self.physics_engine.update()
-    
+        """
+        Runs as many ticks of the game as the time since the last frame makes
+        up, then places sprites and the viewport between the last two ticks
+        """
+        simulation = self.simulation
+        profiler = self.profiler
+        profiler.begin_frame()
+        for tick in range(self.timestep.advance(delta_time)):
+            self.remember()
+            profiler.start("tick")
+            if self.recorder is not None:
+                self.recorder.step(self.inputs)
+            else:
+                simulation.step(self.inputs, TICK_LENGTH)
+            profiler.stop()
+            self.inputs = []
+
+            for name in simulation.sounds:
+                arcade.play_sound(self.sounds[name])
+            self.set_player_animation(simulation.player_animation)
+            self.player_sprite.update_animation()
+
+            # Draw the new level from where the player starts it
+            if self.teleported:
+                self.teleported = False
+                self.remember()
+
+            # Won or lost, move to game over page
+            if simulation.game_over:
+                if self.recorder is not None:
+                    self.recorder.close()
+                game_over_view = GameOverView()
+                game_over_view.score = simulation.score
+                self.window.show_view(game_over_view)
+                return
+
+        # Move sprites and the viewport between the last two ticks
+        profiler.start("sprite sync")
+        simulation.sync_entities()
+        alpha = self.timestep.alpha
+        for layer in self.moving_layers:
+            layer.sync(alpha)
+        profiler.stop()
+        last_left, last_bottom = self.last_view
+        self.view_left = last_left + (simulation.view_left - last_left) * alpha
+        self.view_bottom = last_bottom + (simulation.view_bottom - last_bottom) * alpha
+
+    def remember(self):
+        """ Keeps where everything that moves is before a tick """
+        self.simulation.sync_entities()
+        for layer in self.moving_layers:
+            layer.remember()
+        self.last_view = (self.simulation.view_left, self.simulation.view_bottom)
+
     def on_mouse_press(self, x, y, button, modifiers):
         """ Called whenever the mouse button is clicked. """
-        # Create an attack
-        attack = arcade.Sprite("sprites/invisible.png", SPRITE_SCALING)
-        bullet = arcade.Sprite("sprites/bullet.png", SPRITE_SCALING)
-        
-        # LEFT BUTTON PRESSED: ATTACK
+        # The simulation aims in level coordinates
+        dest_x = x + self.simulation.view_left
+        dest_y = y + self.simulation.view_bottom
         if button == arcade.MOUSE_BUTTON_LEFT:
-            # Position the attack at the player's current location
-            arcade.play_sound(self.attack_sound)
-            start_y = self.player_sprite.center_y
-            if self.player_faces_left == 1:
-                start_x = self.player_sprite.center_x - 60
-            elif self.player_faces_left == 0:
-                start_x = self.player_sprite.center_x + 60
-            attack.center_x = start_x
-            attack.center_y = start_y
-            
-            # Get from the mouse the destination location for the attack
-            dest_x = x + self.view_left
-            dest_y = y + self.view_bottom
-    
-            # Do math to calculate how to get the attack to the destination.
-            # Calculation the angle in radians between the start points
-            # and end points.
-            x_diff = dest_x - start_x
-            y_diff = dest_y - start_y
-            angle = math.atan2(y_diff, x_diff)            
-            attack.angle = math.degrees(angle)
-            attack.change_x = math.cos(angle) * 0
-            attack.change_y = math.sin(angle) * 0
-            attack.center_y = start_y
-            
-            # Add the attack to the appropriate lists
-            self.attack_list.append(attack)
-        
-        # RIGHT BUTTON PRESSED: BULLET
-        if self.bullet_amount >= 1:
-            if button == arcade.MOUSE_BUTTON_RIGHT:
-                arcade.play_sound(self.pew)
-                start_x = self.player_sprite.center_x
-                start_y = self.player_sprite.center_y
-                bullet.center_x = start_x
-                bullet.center_y = start_y
-                dest_x = x + self.view_left
-                dest_y = y + self.view_bottom
-                x_diff = dest_x - bullet.center_x
-                y_diff = dest_y - bullet.center_y
-                angle = math.atan2(y_diff, x_diff)             
-                bullet.angle = math.degrees(angle)
-                bullet.change_x = math.cos(angle) * 5
-                bullet.change_y = math.sin(angle) * 5            
-                self.bullet_list.append(bullet)
-                self.bullet_amount -= 1
-                self.attack_cooldown = 0
-            
+            self.inputs.append(("mouse_press", dest_x, dest_y, "left"))
+        elif button == arcade.MOUSE_BUTTON_RIGHT:
+            self.inputs.append(("mouse_press", dest_x, dest_y, "right"))
+
     def on_key_press(self, key, modifiers):
         """ Allows user to control player WASD """
-        if key == arcade.key.W:
-            if self.physics_engine.can_jump():
-                arcade.play_sound(self.jump_sound)
-                self.player_sprite.change_y = JUMP_SPEED
-                self.player_sprite.textures = []
-                self.player_sprite.textures.append(arcade.load_texture("sprites/spritesheet.png", x = 0, y = 0, width = 64, height = 64))      
-        elif key == arcade.key.A:
-            self.player_sprite.change_x = -MOVEMENT_SPEED
-            self.player_sprite.textures = []
-            for i in range(4):
-                self.player_sprite.textures.append(arcade.load_texture("sprites/spritesheet.png", x = i*64, y = 128, width = 64, height = 64))
-                self_player_faces_left = 1
-        elif key == arcade.key.D:
-            self.player_sprite.change_x = MOVEMENT_SPEED
-            self.player_sprite.textures = []
-            for i in range(4):
-                self.player_sprite.textures.append(arcade.load_texture("sprites/spritesheet.png", x = i*64, y = 192, width = 64, height = 64))
-                self_player_faces_left = 0
-                
+        if key in GAME_KEYS:
+            self.inputs.append(("key_press", GAME_KEYS[key]))
+        elif key == PROFILER_KEY:
+            self.profiler.enabled = not self.profiler.enabled
+            self.profiler_overlay = ProfilerOverlay(self.profiler) if self.profiler.enabled else None
+        elif key == TRACE_KEY:
+            try:
+                self.profiler.export_chrome_trace(TRACE_FILE)
+                message = f"saved {len(self.profiler.recent_frames())} frames to {os.path.basename(TRACE_FILE)}"
+            except OSError:
+                message = f"couldn't save {os.path.basename(TRACE_FILE)}"
+            if self.profiler_overlay is not None:
+                self.profiler_overlay.show(message)
+
     def on_key_release(self, key, modifiers):
         """
         Called when the user presses a button.
         """
-        if key == arcade.key.A or key == arcade.key.D:
-            self.player_sprite.change_x = 0
-            self.player_sprite.textures = []
-            self.player_sprite.textures.append(arcade.load_texture("sprites/spritesheet.png", x = 0, y = 0, width = 64, height = 64))
-        if key == arcade.key.A:
-            self.player_faces_left = 1
-        elif key == arcade.key.D:
-            self.player_faces_left = 0
+        if key in GAME_KEYS:
+            self.inputs.append(("key_release", GAME_KEYS[key]))
 
 
 def main():
+    global REPLAY_FILE, TRACE_FILE
+    parser = argparse.ArgumentParser(description="Titan Slayer")
+    parser.add_argument("--record", nargs="?", const=DEFAULT_REPLAY_FILE, metavar="REPLAY_FILE",
+                        help=f"record each game's input to play back with replay.py, to {DEFAULT_REPLAY_FILE} by default")
+    parser.add_argument("--trace", default=TRACE_FILE, metavar="TRACE_FILE",
+                        help=f"where F4 saves the profiler's Chrome trace, {TRACE_FILE} by default")
+    args = parser.parse_args()
+    REPLAY_FILE = args.record
+    TRACE_FILE = args.trace
+
     window = arcade.Window(SCREEN_WIDTH, SCREEN_HEIGHT, "Titan Slayer")
     start_view = MenuView()
     window.show_view(start_view)
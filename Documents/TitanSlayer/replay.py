@@ -0,0 +1,205 @@
+# Titan Slayer
+# Recording a game's input and playing it back
+
+import struct
+import sys
+import time
+
+from profiler import Profiler
+from simulation import TICK_LENGTH, TICK_RATE, GameSimulation
+
+# Replays are a fixed header followed by records, each starting with the
+# tick it belongs to and its kind. The header holds the starting level and
+# the settings that change how the game plays; the game has no randomness,
+# so these and the input decide the whole run.
+REPLAY_MAGIC = b"TSRP"
+REPLAY_VERSION = 2
+REPLAY_HEADER = struct.Struct("<4sBBHBdH")
+RECORD_HEADER = struct.Struct("<IB")
+KEY_RECORD = struct.Struct("<B")
+MOUSE_RECORD = struct.Struct("<ddB")
+HASH_RECORD = struct.Struct("<Q")
+
+# Kinds of record
+KEY_PRESS = 0
+KEY_RELEASE = 1
+MOUSE_PRESS = 2
+STATE_HASH = 3
+
+# Keys and mouse buttons as the simulation names them, by their number in a record
+KEYS = ["W", "A", "D"]
+BUTTONS = ["left", "right"]
+
+# A state hash is recorded every this many ticks. The file is written out
+# at each one, so a run cut short loses at most this much.
+HASH_INTERVAL = 60
+
+
+class Recorder:
+    """
+    Steps a new simulation one tick at a time, writing the input given to
+    each tick to a replay file, along with a hash of the game's state every
+    HASH_INTERVAL ticks.
+    """
+    def __init__(self, simulation, filename):
+        self.simulation = simulation
+        self.tick = 0
+        # No distance is written as a negative one, and no stream window as 0
+        activation_distance = simulation.activation_distance
+        if activation_distance is None:
+            activation_distance = -1
+        self.replay_file = open(filename, "wb")
+        self.replay_file.write(REPLAY_HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, simulation.level, TICK_RATE,
+                                                  simulation.grid_physics, activation_distance,
+                                                  simulation.stream_window or 0))
+        self.write_hash()
+
+    def step(self, inputs):
+        """ Records this tick's inputs, then steps the simulation with them """
+        for event in inputs:
+            if event[0] == "key_press":
+                self.write(KEY_PRESS, KEY_RECORD.pack(KEYS.index(event[1])))
+            elif event[0] == "key_release":
+                self.write(KEY_RELEASE, KEY_RECORD.pack(KEYS.index(event[1])))
+            elif event[0] == "mouse_press":
+                self.write(MOUSE_PRESS, MOUSE_RECORD.pack(event[1], event[2], BUTTONS.index(event[3])))
+        self.simulation.step(inputs, TICK_LENGTH)
+        self.tick += 1
+        if self.tick % HASH_INTERVAL == 0:
+            self.write_hash()
+
+    def write(self, kind, data):
+        self.replay_file.write(RECORD_HEADER.pack(self.tick, kind) + data)
+
+    def write_hash(self):
+        """ Records the state after the last tick, and saves what was recorded so far """
+        self.write(STATE_HASH, HASH_RECORD.pack(self.simulation.state_hash()))
+        self.replay_file.flush()
+
+    def close(self):
+        """ Ends the recording with the state it ended in """
+        if self.replay_file.closed:
+            return
+        if self.tick % HASH_INTERVAL != 0:
+            self.write_hash()
+        self.replay_file.close()
+
+
+class Replay:
+    """ A recorded game: where it started, its input by tick and its state hashes by tick """
+    def __init__(self, level, grid_physics, activation_distance, stream_window):
+        self.level = level
+        self.grid_physics = grid_physics
+        self.activation_distance = activation_distance
+        self.stream_window = stream_window
+        self.inputs = {}
+        self.hashes = {}
+        self.ticks = 0
+
+
+def load_replay(filename):
+    """
+    Reads a replay file. Returns None if it isn't one this version can play.
+    A record cut off at the end, from a game that stopped while recording,
+    is left out.
+    """
+    with open(filename, "rb") as replay_file:
+        data = replay_file.read()
+    if len(data) < REPLAY_HEADER.size:
+        return None
+    magic, version, level, tick_rate, grid_physics, activation_distance, stream_window = REPLAY_HEADER.unpack_from(data)
+    if magic != REPLAY_MAGIC or version != REPLAY_VERSION or tick_rate != TICK_RATE:
+        return None
+    if activation_distance < 0:
+        activation_distance = None
+    replay = Replay(level, bool(grid_physics), activation_distance, stream_window or None)
+
+    sizes = {
+        KEY_PRESS: KEY_RECORD.size,
+        KEY_RELEASE: KEY_RECORD.size,
+        MOUSE_PRESS: MOUSE_RECORD.size,
+        STATE_HASH: HASH_RECORD.size,
+    }
+    offset = REPLAY_HEADER.size
+    while offset + RECORD_HEADER.size <= len(data):
+        tick, kind = RECORD_HEADER.unpack_from(data, offset)
+        if kind not in sizes:
+            return None
+        offset += RECORD_HEADER.size
+        if offset + sizes[kind] > len(data):
+            break
+        if kind == STATE_HASH:
+            replay.hashes[tick] = HASH_RECORD.unpack_from(data, offset)[0]
+            replay.ticks = max(replay.ticks, tick)
+        else:
+            if kind == MOUSE_PRESS:
+                x, y, button = MOUSE_RECORD.unpack_from(data, offset)
+                event = ("mouse_press", x, y, BUTTONS[button])
+            else:
+                key = KEYS[KEY_RECORD.unpack_from(data, offset)[0]]
+                event = ("key_press" if kind == KEY_PRESS else "key_release", key)
+            replay.inputs.setdefault(tick, []).append(event)
+            replay.ticks = max(replay.ticks, tick + 1)
+        offset += sizes[kind]
+    return replay
+
+
+def play(replay, profiler=None):
+    """
+    Feeds a recorded game's input back into a new simulation tick by tick,
+    checking its state against every recorded hash. Returns the simulation
+    and the first tick whose state differed from the recording, or None if
+    all of them matched. Each tick is a frame of the profiler, if given.
+    """
+    simulation = GameSimulation(replay.level, grid_physics=replay.grid_physics,
+                                activation_distance=replay.activation_distance, stream_window=replay.stream_window,
+                                profiler=profiler)
+    profiler = simulation.profiler
+    # The first hash is of the level as built, which catches changed maps
+    expected = replay.hashes.get(0)
+    if expected is not None and simulation.state_hash() != expected:
+        return simulation, 0
+    for tick in range(replay.ticks):
+        profiler.begin_frame()
+        simulation.step(replay.inputs.get(tick, []), TICK_LENGTH)
+        profiler.end_frame()
+        expected = replay.hashes.get(tick + 1)
+        if expected is not None and simulation.state_hash() != expected:
+            return simulation, tick + 1
+    return simulation, None
+
+
+def main():
+    """
+    Plays back a replay file without a window and says whether it still
+    plays the same. Given a trace file too, every tick is profiled and
+    saved there as a Chrome trace.
+    """
+    if len(sys.argv) < 2:
+        print("usage: python replay.py REPLAY_FILE [TRACE_FILE]")
+        sys.exit(2)
+    filename = sys.argv[1]
+    replay = load_replay(filename)
+    if replay is None:
+        print(f"{filename}: not a replay this version can play")
+        sys.exit(2)
+
+    profiler = None
+    if len(sys.argv) > 2:
+        profiler = Profiler(max(replay.ticks, 1))
+        profiler.enabled = True
+
+    start = time.perf_counter()
+    simulation, diverged = play(replay, profiler)
+    seconds = time.perf_counter() - start
+    if profiler is not None:
+        profiler.export_chrome_trace(sys.argv[2])
+    if diverged is not None:
+        print(f"{filename}: diverged from the recording at tick {diverged}")
+        sys.exit(1)
+    print(f"{filename}: level {replay.level} to level {simulation.level}, {replay.ticks} ticks matched "
+          f"in {seconds:.2f} s ({replay.ticks / seconds:.0f} ticks/s)")
+
+
+if __name__ == "__main__":
+    main()
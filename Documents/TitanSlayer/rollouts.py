@@ -0,0 +1,221 @@
+# Titan Slayer
+# Playing many games at once without a window, for balance testing
+
+import argparse
+import json
+import os
+import random
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from levels import LEVEL_MAPS
+from simulation import GAME_SETTINGS, TICK_LENGTH, TICK_RATE, GameSimulation
+
+# A level not finished in this many ticks counts as not finished
+MAX_TICKS = 60 * TICK_RATE
+
+# How far from an enemy the seek policy stops to attack it. Attacks land
+# 60 pixels in front of the player.
+ATTACK_REACH = 90
+
+
+class SeekPolicy:
+    """
+    Walks to the nearest enemy and attacks it, shooting when it has bullets,
+    then walks to the door. Jumps when it stops moving, and now and then
+    at random.
+    """
+    def __init__(self, rng):
+        self.rng = rng
+        self.held = None
+        self.last_x = None
+        self.stuck_ticks = 0
+
+    def inputs(self, simulation, tick):
+        player = simulation.player
+        inputs = []
+        enemies = simulation.titan_list.entities + simulation.police_list.entities
+        if enemies:
+            target = min(enemies, key=lambda enemy: abs(enemy.center_x - player.center_x))
+        elif len(simulation.door_opened_list) > 0:
+            target = simulation.door_opened_list[0]
+        else:
+            return inputs
+        dx = target.center_x - player.center_x
+        dy = target.center_y - player.center_y
+
+        # Walk towards the target. Enemies are attacked from just out of
+        # their reach, facing them, which letting go of the key sets.
+        reach = ATTACK_REACH if enemies and abs(dy) < 100 else 40
+        key = None
+        if dx > reach:
+            key = "D"
+        elif dx < -reach:
+            key = "A"
+        if key != self.held:
+            if self.held is not None:
+                inputs.append(("key_release", self.held))
+            if key is not None:
+                inputs.append(("key_press", key))
+            self.held = key
+
+        # Jump over whatever stopped it, or up to the target
+        if self.last_x is not None and abs(player.center_x - self.last_x) < 0.5 and key is not None:
+            self.stuck_ticks += 1
+        else:
+            self.stuck_ticks = 0
+        self.last_x = player.center_x
+        if self.stuck_ticks > 10 or (abs(dx) < 100 and dy > 32) or self.rng.random() < 0.02:
+            inputs.append(("key_press", "W"))
+
+        if enemies:
+            if key is None and abs(dy) < 150 and tick % 12 == 0:
+                inputs.append(("mouse_press", target.center_x, target.center_y, "left"))
+            if simulation.bullet_amount > 0 and abs(dx) < 500 and tick % 20 == 0:
+                inputs.append(("mouse_press", target.center_x, target.center_y, "right"))
+        return inputs
+
+
+class RandomPolicy:
+    """ Presses keys and clicks around the player at random """
+    def __init__(self, rng):
+        self.rng = rng
+
+    def inputs(self, simulation, tick):
+        rng = self.rng
+        player = simulation.player
+        inputs = []
+        if rng.random() < 0.05:
+            inputs.append(("key_press", rng.choice(["A", "D"])))
+        if rng.random() < 0.03:
+            inputs.append(("key_release", rng.choice(["A", "D"])))
+        if rng.random() < 0.04:
+            inputs.append(("key_press", "W"))
+        if rng.random() < 0.05:
+            inputs.append(("mouse_press", player.center_x + rng.uniform(-400, 400),
+                           player.center_y + rng.uniform(-300, 300), rng.choice(["left", "right"])))
+        return inputs
+
+
+POLICIES = {
+    "seek": SeekPolicy,
+    "random": RandomPolicy,
+}
+
+
+def rollout(job):
+    """
+    Plays one level from its start until it is finished, the player runs
+    out of lives or falls out of the level, or max_ticks go by. Runs in a
+    worker process, so it takes and returns plain values.
+    """
+    level, policy_name, seed, max_ticks = job
+    start = time.perf_counter()
+    simulation = GameSimulation(level, **GAME_SETTINGS)
+    policy = POLICIES[policy_name](random.Random(seed))
+    enemies = simulation.enemies_left
+    lives = simulation.lives
+    lives_lost = 0
+
+    tick = 0
+    fell = False
+    while tick < max_ticks and simulation.level == level and not simulation.game_over and not fell:
+        simulation.step(policy.inputs(simulation, tick), TICK_LENGTH)
+        tick += 1
+        # Potions give lives back, so only count the ones taken
+        if simulation.lives < lives:
+            lives_lost += lives - simulation.lives
+        lives = simulation.lives
+        fell = simulation.below_level()
+
+    # The door only opens once every enemy is dead
+    finished = simulation.level != level or simulation.won
+    enemies_left = 0 if finished else simulation.enemies_left
+    return {
+        "level": level,
+        "seed": seed,
+        "finished": finished,
+        "fell": fell,
+        "seconds_played": tick * TICK_LENGTH,
+        "lives_lost": lives_lost,
+        "score": simulation.score,
+        "enemies_killed": enemies - enemies_left,
+        "ticks": tick,
+        "wall_seconds": time.perf_counter() - start,
+        "worker": os.getpid(),
+    }
+
+
+def run_rollouts(runs, policy="seek", levels=None, max_ticks=MAX_TICKS, workers=None, seed=0):
+    """ Plays runs rollouts of every level across a pool of worker processes, returning every outcome """
+    if levels is None:
+        levels = sorted(LEVEL_MAPS)
+    jobs = [(level, policy, seed + run, max_ticks) for run in range(runs) for level in levels]
+    workers = workers or os.cpu_count() or 1
+    # Jobs go out in batches, so workers spend their time playing rather than waiting for work
+    chunksize = max(1, len(jobs) // (workers * 8))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(rollout, jobs, chunksize=chunksize))
+
+
+def summarize(outcomes):
+    """ Totals outcomes by level, and ticks per second by worker """
+    by_level = {}
+    for outcome in outcomes:
+        by_level.setdefault(outcome["level"], []).append(outcome)
+    levels = {}
+    for level, level_outcomes in sorted(by_level.items()):
+        finish_times = [outcome["seconds_played"] for outcome in level_outcomes if outcome["finished"]]
+        levels[level] = {
+            "runs": len(level_outcomes),
+            "finished": len(finish_times) / len(level_outcomes),
+            "fell": sum(outcome["fell"] for outcome in level_outcomes) / len(level_outcomes),
+            "median_finish_seconds": statistics.median(finish_times) if finish_times else None,
+            "mean_lives_lost": statistics.mean(outcome["lives_lost"] for outcome in level_outcomes),
+            "mean_score": statistics.mean(outcome["score"] for outcome in level_outcomes),
+            "mean_enemies_killed": statistics.mean(outcome["enemies_killed"] for outcome in level_outcomes),
+        }
+
+    by_worker = {}
+    for outcome in outcomes:
+        ticks, seconds = by_worker.get(outcome["worker"], (0, 0.0))
+        by_worker[outcome["worker"]] = (ticks + outcome["ticks"], seconds + outcome["wall_seconds"])
+    workers = {worker: ticks / seconds for worker, (ticks, seconds) in by_worker.items()}
+    return {"levels": levels, "ticks_per_second_by_worker": workers}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plays many games without a window and totals how they went")
+    parser.add_argument("--runs", type=int, default=100, help="rollouts of each level")
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="seek")
+    parser.add_argument("--levels", type=int, nargs="+", help="levels to play, all of them by default")
+    parser.add_argument("--max-ticks", type=int, default=MAX_TICKS, help="ticks before a level counts as not finished")
+    parser.add_argument("--workers", type=int, help="worker processes, one per core by default")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first rollout, counting up from there")
+    parser.add_argument("--json", help="write every outcome and the totals to this file")
+    options = parser.parse_args()
+
+    start = time.perf_counter()
+    outcomes = run_rollouts(options.runs, options.policy, options.levels, options.max_ticks,
+                            options.workers, options.seed)
+    seconds = time.perf_counter() - start
+    summary = summarize(outcomes)
+
+    print(f"{len(outcomes)} rollouts in {seconds:.1f} s ({len(outcomes) / seconds * 60:.0f} per minute)")
+    print(f"{'level':>5} {'runs':>6} {'finished':>9} {'fell':>5} {'finish s':>9} {'lives lost':>11} {'score':>6} {'kills':>6}")
+    for level, totals in summary["levels"].items():
+        finish = totals["median_finish_seconds"]
+        finish_text = f"{finish:.1f}" if finish is not None else "-"
+        print(f"{level:>5} {totals['runs']:>6} {totals['finished'] * 100:>8.0f}% {totals['fell'] * 100:>4.0f}% {finish_text:>9} "
+              f"{totals['mean_lives_lost']:>11.2f} {totals['mean_score']:>6.1f} {totals['mean_enemies_killed']:>6.2f}")
+    rates = sorted(summary["ticks_per_second_by_worker"].values())
+    print(f"{len(rates)} workers, {min(rates):.0f}-{max(rates):.0f} ticks/s each")
+
+    if options.json:
+        with open(options.json, "w") as results_file:
+            json.dump({"outcomes": outcomes, "summary": summary}, results_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1651 @@
+# Titan Slayer
+# Game rules, without a window
+
+import hashlib
+import heapq
+import math
+import struct
+import threading
+
+from levels import LEVEL_MAPS, LEVEL_SPAWNS, load_map, map_cells, open_map_stream
+from profiler import Profiler
+
+# CONSTANTS
+SPRITE_SCALING = 1
+SCREEN_WIDTH = 800
+SCREEN_HEIGHT = 600
+
+# Pixels to keep as minimum margin between character and edge of screen
+VIEWPORT_MARGIN = 192
+RIGHT_MARGIN = 260
+TILE_SIZE = 64
+SCALED_TILE_SIZE = TILE_SIZE * SPRITE_SCALING
+MAP_HEIGHT = 7
+# The player can't go further right than this many tiles from the end of the map
+RIGHT_EDGE_COLUMNS = 5
+
+# Physics
+MOVEMENT_SPEED = 4
+JUMP_SPEED = 8
+GRAVITY = 0.5
+attack_SPEED = 5
+
+# Lists each level fills with its own entities
+LEVEL_LIST_NAMES = ["titan_list", "police_list", "wall_list", "coin_list", "door_opened_list", "door_list",
+                    "health_potion_list", "lava_list", "strength_potion_list", "gun_list"]
+
+# What each map tile ID becomes, as (list, texture, left, top) for every
+# entity it makes. Left and top move the entity's edges in from the tile's.
+# IDs missing here are empty.
+TILE_TYPES = {
+    1: [("wall_list", 1, 0, 0)],
+    2: [("wall_list", 2, 0, 0)],
+    3: [("wall_list", 3, 0, 0)],
+    4: [("wall_list", 4, 0, 0)],
+    5: [("wall_list", 5, 0, 0)],
+    6: [("wall_list", 6, 0, 0)],
+    7: [("coin_list", 7, 15, -15)],
+    8: [("door_opened_list", 8, 0, 0), ("door_list", "door", 0, 0)],
+    9: [("health_potion_list", 9, 16, -15)],
+    10: [("lava_list", 10, 0, -22)],
+    11: [("strength_potion_list", 11, 16, -15)],
+    12: [("gun_list", 12, 0, -25)],
+}
+
+# Lists whose entities can move, change or go away, which state hashes cover
+STATE_LIST_NAMES = ["titan_list", "police_list", "coin_list", "door_list", "health_potion_list",
+                    "strength_potion_list", "gun_list", "attack_list", "bullet_list", "enemy_bullet_list"]
+
+# Cell size of the hash that finds enemies for projectiles. Enemies are up
+# to a few tiles big, so cells bigger than a tile keep each in few cells.
+ENEMY_HASH_CELL_SIZE = 2 * SCALED_TILE_SIZE
+
+# Width of the strips of level enemies are filed under, to find the ones
+# near the viewport
+ACTIVATION_CHUNK_WIDTH = 8 * SCALED_TILE_SIZE
+
+# Tile IDs the player sets off by touching them, by kind of trigger
+TRIGGER_KINDS = {
+    7: "coin",
+    8: "door",
+    9: "health_potion",
+    10: "lava",
+    11: "strength_potion",
+    12: "gun",
+}
+
+# Timings, in seconds of simulation time
+HURT_COOLDOWN = 2
+ATTACK_COOLDOWN = 1
+POTION_DURATION = 10
+# Police all fire together, as they did every 150 frames at 60 fps
+POLICE_FIRE_INTERVAL = 2.5
+
+# Events due this close to now count as due, so adding up frame times
+# can't push them a frame late
+SCHEDULER_EPSILON = 1e-9
+
+# The game moves on in ticks of the same length whatever the display's
+# frame rate. A slow frame runs at most MAX_TICKS_PER_FRAME ticks to catch
+# up, and time beyond that is dropped, so the game slows down for a moment
+# instead of falling further and further behind.
+TICK_RATE = 60
+TICK_LENGTH = 1 / TICK_RATE
+MAX_TICKS_PER_FRAME = 5
+
+# Levels at least this many columns wide can be streamed: their map is read
+# in chunks of STREAM_CHUNK_COLUMNS columns as the viewport comes near, and
+# only a window of STREAM_WINDOW chunks around it is kept. The window is far
+# wider than the distance enemies wake at, so they only leave asleep.
+STREAM_MIN_COLUMNS = 1024
+STREAM_CHUNK_COLUMNS = 16
+STREAM_WINDOW = 8
+
+# The settings GameView plays with, for running the game the same way without
+# it. The player finds walls through the tile grid, enemies further than a
+# screen's width outside the screen sleep until the player comes near, and
+# very wide levels are streamed.
+GAME_SETTINGS = {"grid_physics": True, "activation_distance": SCREEN_WIDTH, "stream_window": STREAM_WINDOW}
+
+# Most projectiles kept for reuse by each pool
+PROJECTILE_POOL_SIZE = 256
+
+# Hit boxes as the points of a polygon around the center at scale 1. These
+# are the points arcade 2.5.5's Simple algorithm finds for each texture: its
+# box inside the transparent border, with any empty corners cut off. The
+# player's is taken from its idle frame. Tile IDs stand for their cell in
+# the spritesheet.
+WALL_BOX = ((-32, -32), (32, -32), (32, 32), (-32, 32))
+HIT_BOXES = {
+    1: WALL_BOX,
+    2: WALL_BOX,
+    3: ((-32, -32), (32, -32), (32, 32), (-25, 32), (-32, 25)),
+    4: ((-32, -32), (32, -32), (32, 25), (25, 32), (-32, 32)),
+    5: ((-32, -25), (-25, -32), (32, -32), (32, 32), (-25, 32), (-32, 25)),
+    6: ((-32, -32), (25, -32), (32, -25), (32, 25), (25, 32), (-32, 32)),
+    7: ((-17, -11), (-7, -21), (8, -21), (18, -11), (18, 5), (8, 15), (-7, 15), (-17, 5)),
+    8: ((-32, -32), (32, -32), (32, 16), (16, 32), (-16, 32), (-32, 16)),
+    9: ((-11, -13), (-5, -19), (7, -19), (13, -13), (13, 9), (5, 17), (-4, 17), (-11, 10)),
+    10: ((-32, -32), (32, -32), (32, 11), (-32, 11)),
+    11: ((-12, -12), (-6, -18), (5, -18), (11, -12), (11, 11), (4, 18), (-5, 18), (-12, 11)),
+    12: ((-31, -10), (-23, -18), (9, -18), (32, 5), (32, 6), (28, 10), (-31, 10)),
+    "door": ((-32, -32), (32, -32), (32, 16), (16, 32), (-16, 32), (-32, 16)),
+    "player": ((-24, -18), (-16, -26), (12, -26), (20, -18), (20, 12), (6, 26), (-10, 26), (-24, 12)),
+    "sprites/titan.png": ((-35, -45), (-17, -63), (11, -63), (30, -44), (30, 25), (8, 47), (-12, 47), (-35, 24)),
+    "sprites/abnormal.png": ((-53, -61), (-51, -63), (48, -63), (50, -61), (50, 13), (13, 50), (-9, 50), (-53, 6)),
+    "sprites/bert.png": ((-59, -110), (-45, -124), (48, -124), (61, -111), (61, 74), (12, 123), (-10, 123), (-59, 74)),
+    "sprites/police.png": ((-29, -6), (-9, -26), (6, -26), (26, -6), (26, 3), (4, 25), (-7, 25), (-29, 3)),
+    "sprites/bullet.png": ((-31, 1), (-18, -12), (15, -12), (32, 5), (32, 6), (28, 10), (-31, 10)),
+    "sprites/invisible.png": ((-32, -30), (-30, -32), (31, -32), (32, -31), (32, 29), (29, 32), (-32, 32)),
+}
+
+
+class Entity:
+    """
+    A box that moves through the level, standing in for an arcade.Sprite.
+    The renderer keeps the matching sprite in the sprite attribute.
+    """
+    def __init__(self, texture, scale=1):
+        self.texture = texture
+        self.scale = scale
+        self.center_x = 0.0
+        self.center_y = 0.0
+        self.change_x = 0.0
+        self.change_y = 0.0
+        self.entity_lists = []
+        self.sprite = None
+        self.pool = None
+
+        # Set while the entity's state lives in an EntityStore
+        self.store = None
+        self.store_index = None
+
+        # Set on the entities of streamed levels, naming what they were made from
+        self.stream_key = None
+
+        # The hit box's points, and the sides of the box around them, kept
+        # as plain attributes so most collisions only compare those
+        self._points = tuple((x * scale, y * scale) for x, y in HIT_BOXES[texture])
+        self._box = (min(x for x, y in self._points), max(x for x, y in self._points),
+                     min(y for x, y in self._points), max(y for x, y in self._points))
+        self._angle = 0.0
+        self.box_left, self.box_right, self.box_bottom, self.box_top = self._box
+        # The points collisions test, as offsets from the center. None when
+        # the hit box is a plain rectangle, which its sides already describe.
+        self._rectangle = is_rectangle(self._points, self._box)
+        self.points = None if self._rectangle else self._points
+
+    @property
+    def angle(self):
+        return self._angle
+
+    @angle.setter
+    def angle(self, angle):
+        """
+        Rotating the entity turns its hit box with it. Collisions test the
+        rotated points, rounded to hundredths as arcade rounds them, and the
+        box sides grow to their bounds, which the grids and hashes file the
+        entity under.
+        """
+        self._angle = angle
+        if not angle:
+            self.points = None if self._rectangle else self._points
+            self.box_left, self.box_right, self.box_bottom, self.box_top = self._box
+            return
+        radians = math.radians(angle)
+        cos = math.cos(radians)
+        sin = math.sin(radians)
+        self.points = [(round(x * cos - y * sin, 2), round(x * sin + y * cos, 2)) for x, y in self._points]
+        self.box_left = min(x for x, y in self.points)
+        self.box_right = max(x for x, y in self.points)
+        self.box_bottom = min(y for x, y in self.points)
+        self.box_top = max(y for x, y in self.points)
+
+    @property
+    def left(self):
+        return self.center_x + self.box_left
+
+    @left.setter
+    def left(self, amount):
+        self.center_x = amount - self.box_left
+
+    @property
+    def right(self):
+        return self.center_x + self.box_right
+
+    @right.setter
+    def right(self, amount):
+        self.center_x = amount - self.box_right
+
+    @property
+    def bottom(self):
+        return self.center_y + self.box_bottom
+
+    @bottom.setter
+    def bottom(self, amount):
+        self.center_y = amount - self.box_bottom
+
+    @property
+    def top(self):
+        return self.center_y + self.box_top
+
+    @top.setter
+    def top(self, amount):
+        self.center_y = amount - self.box_top
+
+    def update(self):
+        """ Moves the entity by its speed """
+        self.center_x += self.change_x
+        self.center_y += self.change_y
+
+    def remove_from_lists(self):
+        """ Removes the entity from every list it is in, returning it to its pool """
+        if not self.entity_lists:
+            return
+        for entity_list in self.entity_lists[:]:
+            entity_list.remove(self)
+        if self.pool is not None:
+            self.pool.release(self)
+
+    def kill(self):
+        self.remove_from_lists()
+
+
+class EntityList:
+    """
+    A list of entities, standing in for an arcade.SpriteList.
+    Its listeners are told about every entity added or removed.
+    """
+    def __init__(self):
+        self.entities = []
+        self.listeners = []
+
+    def append(self, entity):
+        self.entities.append(entity)
+        entity.entity_lists.append(self)
+        for listener in self.listeners:
+            listener.added(entity)
+
+    def remove(self, entity):
+        self.entities.remove(entity)
+        entity.entity_lists.remove(self)
+        for listener in self.listeners:
+            listener.removed(entity)
+
+    def update(self):
+        for entity in self.entities:
+            entity.update()
+
+    def __iter__(self):
+        return iter(self.entities)
+
+    def __len__(self):
+        return len(self.entities)
+
+    def __getitem__(self, index):
+        return self.entities[index]
+
+
+class ProjectilePool:
+    """
+    Keeps removed projectiles in a free list so new shots reuse them, along
+    with the sprite the renderer made for them, instead of allocating.
+    """
+    def __init__(self, texture, scale, capacity=PROJECTILE_POOL_SIZE):
+        self.texture = texture
+        self.scale = scale
+        self.capacity = capacity
+        self.free = []
+        self.hits = 0
+        self.misses = 0
+
+    def acquire(self):
+        """ Returns a projectile at rest, reusing a free one if there is one """
+        if self.free:
+            self.hits += 1
+            entity = self.free.pop()
+            entity.center_x = 0.0
+            entity.center_y = 0.0
+            entity.change_x = 0.0
+            entity.change_y = 0.0
+            entity.angle = 0.0
+        else:
+            self.misses += 1
+            entity = Entity(self.texture, self.scale)
+            entity.pool = self
+        return entity
+
+    def release(self, entity):
+        """ Takes back a projectile that has left every list """
+        if len(self.free) < self.capacity:
+            self.free.append(entity)
+
+
+class Scheduler:
+    """
+    Runs callbacks at set times of a clock that advances with the game.
+    Events wait in a heap by due time, so a frame only costs as much as the
+    events that come due in it. Events due at the same time run in the
+    order they were scheduled.
+    """
+    def __init__(self):
+        self.time = 0.0
+        self.queue = []
+        self.scheduled = 0
+
+    def schedule(self, delay, callback, interval=None):
+        """
+        Calls callback delay seconds from now, then every interval seconds
+        after that if given. Returns the event, for cancel.
+        """
+        event = [self.time + delay, self.scheduled, callback, interval]
+        self.scheduled += 1
+        heapq.heappush(self.queue, event)
+        return event
+
+    def cancel(self, event):
+        # Left in the heap, and skipped when it comes due
+        event[2] = None
+
+    def advance(self, delta_time):
+        """ Moves the clock on and runs every event now due """
+        self.time += delta_time
+        while self.queue and self.queue[0][0] <= self.time + SCHEDULER_EPSILON:
+            event = heapq.heappop(self.queue)
+            callback = event[2]
+            if callback is None:
+                continue
+            # Repeats count from when they were due, so they don't drift
+            if event[3] is not None:
+                event[0] += event[3]
+                event[1] = self.scheduled
+                self.scheduled += 1
+                heapq.heappush(self.queue, event)
+            callback()
+
+
+class Cooldown:
+    """ Becomes ready a set time after it was last restarted """
+    def __init__(self, scheduler, duration):
+        self.scheduler = scheduler
+        self.duration = duration
+        self.ready = False
+        self.event = None
+        self.restart()
+
+    def restart(self):
+        self.ready = False
+        if self.event is not None:
+            self.scheduler.cancel(self.event)
+        self.event = self.scheduler.schedule(self.duration, self.finish)
+
+    def finish(self):
+        self.ready = True
+        self.event = None
+
+
+class FixedTimestep:
+    """
+    Turns the uneven time between frames into whole ticks of tick_length.
+    Time short of a tick is carried over to the next frame, and alpha is how
+    far the frame falls into the next tick, for drawing between ticks.
+    """
+    def __init__(self, tick_length=TICK_LENGTH, max_ticks=MAX_TICKS_PER_FRAME):
+        self.tick_length = tick_length
+        self.max_ticks = max_ticks
+        self.accumulator = 0.0
+        self.alpha = 0.0
+        self.dropped = 0.0
+
+    def advance(self, elapsed):
+        """ Adds a frame's time and returns how many ticks to run """
+        self.accumulator += elapsed
+        ticks = int((self.accumulator + SCHEDULER_EPSILON) // self.tick_length)
+        self.accumulator = max(self.accumulator - ticks * self.tick_length, 0.0)
+        if ticks > self.max_ticks:
+            self.dropped += (ticks - self.max_ticks) * self.tick_length
+            ticks = self.max_ticks
+        self.alpha = self.accumulator / self.tick_length
+        return ticks
+
+
+def check_for_collision(entity_1, entity_2):
+    """
+    Checks if two entities' hit boxes overlap. Touching edges don't count.
+    Boxes that don't overlap can't have polygons inside them that do, so
+    only entities whose bounds overlap have their points tested, and only
+    if one of them isn't an unrotated rectangle.
+    """
+    if not (entity_1.center_x + entity_1.box_left < entity_2.center_x + entity_2.box_right
+            and entity_2.center_x + entity_2.box_left < entity_1.center_x + entity_1.box_right
+            and entity_1.center_y + entity_1.box_bottom < entity_2.center_y + entity_2.box_top
+            and entity_2.center_y + entity_2.box_bottom < entity_1.center_y + entity_1.box_top):
+        return False
+    if entity_1.points is None and entity_2.points is None:
+        return True
+    return polygons_overlap(hit_polygon(entity_1), hit_polygon(entity_2))
+
+
+def is_rectangle(points, box):
+    """ Whether a hit box's points are just the corners of the box around them """
+    box_left, box_right, box_bottom, box_top = box
+    return len(points) == 4 and set(points) == {(box_left, box_bottom), (box_right, box_bottom),
+                                                (box_right, box_top), (box_left, box_top)}
+
+
+def hit_polygon(entity):
+    """ Returns the points of an entity's hit box in level coordinates, rotated if it is """
+    points = entity.points
+    if points is None:
+        box_left, box_right, box_bottom, box_top = entity._box
+        points = ((box_left, box_bottom), (box_right, box_bottom), (box_right, box_top), (box_left, box_top))
+    return [(entity.center_x + x, entity.center_y + y) for x, y in points]
+
+
+def polygons_overlap(polygon_1, polygon_2):
+    """
+    Separating axis test of two convex polygons, as arcade does it: they
+    overlap unless their shadows on the normal of some edge of either one
+    are apart. Touching counts as apart.
+    """
+    for polygon in (polygon_1, polygon_2):
+        for index, (x1, y1) in enumerate(polygon):
+            x2, y2 = polygon[index - 1]
+            normal_x = y2 - y1
+            normal_y = x1 - x2
+            shadow_1 = [normal_x * x + normal_y * y for x, y in polygon_1]
+            shadow_2 = [normal_x * x + normal_y * y for x, y in polygon_2]
+            if max(shadow_1) <= min(shadow_2) or max(shadow_2) <= min(shadow_1):
+                return False
+    return True
+
+
+def check_for_collision_with_list(entity, entity_list):
+    """ Returns every entity in the list that overlaps the given one """
+    return [other for other in entity_list if check_for_collision(entity, other)]
+
+
+class SpatialHash:
+    """
+    Buckets entities by the grid cells their hit boxes cover, so a collision
+    check only looks at entities in the cells the other entity touches.
+    """
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.cells = {}
+
+    def cells_for(self, entity):
+        """ Returns the (column, row) of every cell the entity's hit box covers """
+        cell_size = self.cell_size
+        min_column = math.floor((entity.center_x + entity.box_left) / cell_size)
+        max_column = math.floor((entity.center_x + entity.box_right) / cell_size)
+        min_row = math.floor((entity.center_y + entity.box_bottom) / cell_size)
+        max_row = math.floor((entity.center_y + entity.box_top) / cell_size)
+        return [(column, row)
+                for column in range(min_column, max_column + 1)
+                for row in range(min_row, max_row + 1)]
+
+    def insert(self, entity):
+        for cell in self.cells_for(entity):
+            self.cells.setdefault(cell, []).append(entity)
+
+    def remove(self, entity):
+        for cell in self.cells_for(entity):
+            bucket = self.cells.get(cell)
+            if bucket is not None and entity in bucket:
+                bucket.remove(entity)
+                if not bucket:
+                    del self.cells[cell]
+
+    def get_collisions(self, entity):
+        """ Returns every entity in the hash that overlaps the given one """
+        hit_list = []
+        for cell in self.cells_for(entity):
+            for other in self.cells.get(cell, ()):
+                if other not in hit_list and check_for_collision(entity, other):
+                    hit_list.append(other)
+        return hit_list
+
+
+class TileGrid:
+    """
+    A level's tiles by row and column, with row 0 at the top like the map.
+    Every tile entity's hit box lies inside its own tile, so the ones
+    overlapping a box are all in the tiles under it. Each row only keeps the
+    tiles holding something, by column, so a grid costs as much as what is
+    in it however wide the level is.
+    """
+    def __init__(self, rows, columns):
+        self.rows = rows
+        self.columns = columns
+        self.cells = [{} for row in range(rows)]
+
+    def cell_of(self, entity):
+        """ Returns the (row, column) of the tile under the entity's center """
+        return (MAP_HEIGHT - 1 - math.floor(entity.center_y / SCALED_TILE_SIZE),
+                math.floor(entity.center_x / SCALED_TILE_SIZE))
+
+    def add(self, entity):
+        row, column = self.cell_of(entity)
+        self.cells[row][column] = entity
+
+    def remove(self, entity):
+        row, column = self.cell_of(entity)
+        if self.cells[row].get(column) is entity:
+            del self.cells[row][column]
+
+    def get_collisions(self, entity):
+        """ Returns every tile entity that overlaps the entity, looking only at the tiles it covers """
+        first_column = max(math.floor((entity.center_x + entity.box_left) / SCALED_TILE_SIZE), 0)
+        last_column = min(math.floor((entity.center_x + entity.box_right) / SCALED_TILE_SIZE), self.columns - 1)
+        first_row = max(MAP_HEIGHT - 1 - math.floor((entity.center_y + entity.box_top) / SCALED_TILE_SIZE), 0)
+        last_row = min(MAP_HEIGHT - 1 - math.floor((entity.center_y + entity.box_bottom) / SCALED_TILE_SIZE), self.rows - 1)
+        hit_list = []
+        for row in range(first_row, last_row + 1):
+            cells = self.cells[row]
+            for column in range(first_column, last_column + 1):
+                other = cells.get(column)
+                if other is not None and check_for_collision(entity, other):
+                    hit_list.append(other)
+        return hit_list
+
+
+class TriggerGrid(TileGrid):
+    """
+    The pickups and hazards of a level by tile. It listens to their lists,
+    so items leave the grid as soon as they are picked up.
+    """
+    def __init__(self, rows, columns, entity_lists):
+        super().__init__(rows, columns)
+        for entity_list in entity_lists:
+            entity_list.listeners.append(self)
+
+    def added(self, entity):
+        self.add(entity)
+
+    def removed(self, entity):
+        self.remove(entity)
+
+    def get_triggers(self, entity):
+        """ Returns the triggers the entity overlaps, as a list for each kind in TRIGGER_KINDS """
+        triggers = {kind: [] for kind in TRIGGER_KINDS.values()}
+        for trigger in self.get_collisions(entity):
+            triggers[TRIGGER_KINDS[trigger.texture]].append(trigger)
+        return triggers
+
+
+class DynamicHash(SpatialHash):
+    """
+    A spatial hash for things that move, rebuilt every frame. Entities go in
+    with a tag saying what they are, so one query finds every kind at once.
+    """
+    def __init__(self, cell_size):
+        super().__init__(cell_size)
+        self.tags = []
+
+    def rebuild(self, tagged_lists):
+        """ Empties the hash, then adds every entity of each (tag, entity list) pair """
+        self.tags = [tag for tag, entity_list in tagged_lists]
+        self.cells = {}
+        for tag, entity_list in tagged_lists:
+            for entity in entity_list:
+                for cell in self.cells_for(entity):
+                    self.cells.setdefault(cell, []).append((tag, entity))
+
+    def get_hits(self, entity):
+        """ Returns the entities in the hash that overlap the given one, as a list for each tag """
+        hits = {tag: [] for tag in self.tags}
+        for cell in self.cells_for(entity):
+            for tag, other in self.cells.get(cell, ()):
+                if other not in hits[tag] and check_for_collision(entity, other):
+                    hits[tag].append(other)
+        return hits
+
+
+class ActivationZones:
+    """
+    Lets the enemies of a list sleep while they are far from the viewport.
+    Enemies never leave their patrol range, so each is filed once under the
+    strips of level that range covers. The awake ones are only looked up
+    again when the viewport moves into another strip, and keep the order
+    they spawn in, so a level plays out the same every time, streamed or not.
+    """
+    def __init__(self, entity_list, distance):
+        self.distance = distance
+        self.chunks = {}
+        self.entity_chunks = {}
+        self.order = {}
+        self.added_count = 0
+        self.chunk_range = None
+        self.awake = []
+        entity_list.listeners.append(self)
+        for entity in entity_list:
+            self.added(entity)
+
+    def added(self, entity):
+        # A whole level adds its enemies in spawn order, but a streamed one
+        # adds them as their chunks load, so those go by their spawn number
+        if entity.stream_key is not None:
+            self.order[entity] = (0, entity.stream_key[1])
+        else:
+            self.order[entity] = (1, self.added_count)
+        self.added_count += 1
+
+        # An enemy can overshoot its patrol bounds by one step before it turns
+        left = min(entity.left, entity.boundary_left) - abs(entity.change_x)
+        right = max(entity.right, entity.boundary_right) + abs(entity.change_x)
+        chunks = range(math.floor(left / ACTIVATION_CHUNK_WIDTH), math.floor(right / ACTIVATION_CHUNK_WIDTH) + 1)
+        self.entity_chunks[entity] = chunks
+        for chunk in chunks:
+            self.chunks.setdefault(chunk, []).append(entity)
+
+        # Look the awake enemies up again next frame
+        self.chunk_range = None
+
+    def removed(self, entity):
+        for chunk in self.entity_chunks.pop(entity):
+            self.chunks[chunk].remove(entity)
+        del self.order[entity]
+        if entity in self.awake:
+            self.awake.remove(entity)
+
+    def update(self, view_left):
+        """ Returns the enemies within distance of the viewport, waking and putting them to sleep as it moves """
+        first = math.floor((view_left - self.distance) / ACTIVATION_CHUNK_WIDTH)
+        last = math.floor((view_left + SCREEN_WIDTH + self.distance) / ACTIVATION_CHUNK_WIDTH)
+        if (first, last) != self.chunk_range:
+            self.chunk_range = (first, last)
+            awake = set()
+            for chunk in range(first, last + 1):
+                awake.update(self.chunks.get(chunk, ()))
+            self.awake = sorted(awake, key=self.order.get)
+        return self.awake
+
+
+class PhysicsEnginePlatformer:
+    """ Moves the player under gravity and stops it at walls, like arcade's engine """
+    def __init__(self, player, walls, gravity_constant=0.5):
+        self.player = player
+        self.walls = walls
+        self.gravity_constant = gravity_constant
+
+    def collisions(self):
+        """ Returns every wall the player overlaps """
+        return check_for_collision_with_list(self.player, self.walls)
+
+    def can_jump(self, y_distance=5):
+        """ Checks if there is a wall just below the player """
+        self.player.center_y -= y_distance
+        hit_list = self.collisions()
+        self.player.center_y += y_distance
+        return len(hit_list) > 0
+
+    def update(self):
+        """ Adds gravity, then moves the player one axis at a time """
+        player = self.player
+        player.change_y -= self.gravity_constant
+
+        # --- Move in the y direction
+        player.center_y += player.change_y
+        hit_list = self.collisions()
+        if len(hit_list) > 0:
+            if player.change_y > 0:
+                while len(self.collisions()) > 0:
+                    player.center_y -= 1
+            elif player.change_y < 0:
+                for wall in hit_list:
+                    while check_for_collision(player, wall):
+                        player.center_y += 0.25
+            player.change_y = 0
+        player.center_y = round(player.center_y, 2)
+
+        # --- Move in the x direction
+        if player.change_x:
+            original_y = player.center_y
+            player.center_x += player.change_x
+            if len(self.collisions()) > 0:
+                # Step up small ledges, as far as we moved sideways
+                climbed = False
+                for rise in range(1, int(abs(player.change_x)) + 1):
+                    player.center_y = original_y + rise
+                    if len(self.collisions()) == 0:
+                        climbed = True
+                        break
+
+                # Otherwise back out of the wall a pixel at a time
+                if not climbed:
+                    player.center_y = original_y
+                    direction = math.copysign(1, player.change_x)
+                    while len(self.collisions()) > 0:
+                        player.center_x -= direction
+
+
+class GridPhysicsEngine(PhysicsEnginePlatformer):
+    """
+    The same platformer physics, finding walls through the level's tile
+    grid instead of checking every wall, so the cost of a step doesn't grow
+    with the level.
+    """
+    def __init__(self, player, wall_grid, gravity_constant=0.5):
+        super().__init__(player, None, gravity_constant)
+        self.wall_grid = wall_grid
+
+    def collisions(self):
+        return self.wall_grid.get_collisions(self.player)
+
+
+class Enemy(Entity):
+    """ This class holds enemy information """
+    def __init__(self, filename, scale):
+
+        # Call Parent Class
+        super().__init__(filename, scale)
+        self._enemy_health = 0
+
+    @property
+    def enemy_health(self):
+        if self.store is not None:
+            return self.store.health[self.store_index]
+        return self._enemy_health
+
+    @enemy_health.setter
+    def enemy_health(self, health):
+        if self.store is not None:
+            self.store.health[self.store_index] = health
+        else:
+            self._enemy_health = health
+
+    def attributes(self, center_x, center_y, change_x, range_x, health):
+        """ Controls enemy's mindless movement """
+        self.center_x = center_x * SCALED_TILE_SIZE
+        self.center_y = center_y * SCALED_TILE_SIZE
+        self.change_x = change_x
+        self.range_x = range_x
+        self.boundary_left = self.center_x - (range_x * SCALED_TILE_SIZE)
+        self.boundary_right = self.center_x + (range_x * SCALED_TILE_SIZE)
+        self.enemy_health = health
+
+    def enemy_update(self):
+        """ Updates enemy's movement """
+        # If the enemy hit the left boundary, reverse
+        if self.left < self.boundary_left:
+            self.change_x *= -1
+        # If the self hit the right boundary, reverse
+        elif self.right > self.boundary_right:
+            self.change_x *= -1
+
+    def shooting_update(self, player, bullet_list, bullet_pool):
+        """ Lets enemies shoot at player """
+        # Bullet comes from enemy's center
+        start_x = self.center_x
+        start_y = self.center_y
+
+        # Bullet aims at player
+        dest_x = player.center_x
+        dest_y = player.center_y
+
+        # Do math to calculate how to get the bullet to the destination.
+        # Calculation the angle in radians between the start points
+        # and end points. This is the angle the bullet will travel.
+        x_diff = dest_x - start_x
+        y_diff = dest_y - start_y
+        angle = math.atan2(y_diff, x_diff)
+
+        bullet = bullet_pool.acquire()
+        bullet.center_x = start_x
+        bullet.center_y = start_y
+
+        # Angle the bullet sprite
+        bullet.angle = math.degrees(angle)
+
+        # Taking into account the angle, calculate our change_x
+        # and change_y. Velocity is how fast the bullet travels.
+        bullet.change_x = math.cos(angle) * 5
+        bullet.change_y = math.sin(angle) * 5
+
+        bullet_list.append(bullet)
+
+
+def build_level(level, prepare_scene=None, stream_window=None):
+    """
+    Create maps based on level. Builds the level's scene without touching
+    the game, so it can run on a worker thread. If given, prepare_scene is
+    called with the finished scene, letting the renderer make sprites ahead
+    of time. Given a stream_window, levels STREAM_MIN_COLUMNS wide or more
+    are streamed with that many chunks in memory instead of built whole.
+    """
+    if stream_window is not None:
+        map_stream = open_map_stream(LEVEL_MAPS[level])
+        if map_stream is not None:
+            if map_stream.columns >= STREAM_MIN_COLUMNS:
+                return build_streamed_scene(level, map_stream, LEVEL_SPAWNS[level], stream_window, prepare_scene)
+            map_stream.close()
+    return build_scene(level, load_map(LEVEL_MAPS[level]), LEVEL_SPAWNS[level], prepare_scene)
+
+
+def build_scene(level, map_array, spawns, prepare_scene=None):
+    """ Builds a scene from a map and its enemies, laid out like LEVEL_SPAWNS """
+    rows = len(map_array)
+    columns = max((len(map_row) for map_row in map_array), default=0)
+    scene = LevelScene(level, rows, columns)
+
+    # Create Enemies
+    scene.enemies_left = len(spawns)
+    for spawn in spawns:
+        scene.add(*make_enemy(spawn))
+
+    # Only cells holding something are visited, each making just what its tile needs
+    for row_index, column_index, item in map_cells(map_array):
+        for entity, list_name in make_tiles(row_index, column_index, item):
+            scene.add(entity, list_name)
+
+    if prepare_scene is not None:
+        prepare_scene(scene)
+    return scene
+
+
+def build_streamed_scene(level, map_stream, spawns, window, prepare_scene=None):
+    """ Builds a scene that streams its map and enemies in as the viewport nears them, starting at the left """
+    scene = LevelScene(level, map_stream.rows, map_stream.columns)
+    scene.enemies_left = len(spawns)
+    scene.stream = LevelStream(scene, map_stream, spawns, window)
+    scene.stream.update(0)
+    if prepare_scene is not None:
+        prepare_scene(scene)
+    return scene
+
+
+def make_enemy(spawn):
+    """ Makes an enemy laid out like LEVEL_SPAWNS, returning it with the name of its list """
+    list_name, filename, scale, center_x, center_y, change_x, range_x, health = spawn
+    enemy = Enemy(filename, SPRITE_SCALING * scale)
+    enemy.attributes(center_x, center_y, change_x, range_x, health)
+    if list_name == "police":
+        return enemy, "police_list"
+    return enemy, "titan_list"
+
+
+def make_tiles(row_index, column_index, item):
+    """ Makes the entities of one map tile, returning each with the name of its list """
+    tiles = []
+    for list_name, texture, left, top in TILE_TYPES.get(item, ()):
+        entity = Entity(texture)
+
+        # Calculate where the sprite goes
+        entity.left = column_index * SCALED_TILE_SIZE + left
+        entity.top = (MAP_HEIGHT - row_index) * SCALED_TILE_SIZE + top
+        tiles.append((entity, list_name))
+    return tiles
+
+
+class LevelScene:
+    """
+    Owns every list that belongs to one level. Levels are swapped by
+    replacing the whole scene, so leaving a level costs the same however
+    big it was, and nothing from it is kept.
+    """
+    def __init__(self, level, rows=0, columns=0):
+        self.level = level
+        self.enemies_left = 0
+        for list_name in LEVEL_LIST_NAMES:
+            setattr(self, list_name, EntityList())
+
+        # Walls never move, so projectiles find them through a grid built once per level
+        self.wall_hash = SpatialHash(SCALED_TILE_SIZE)
+        # The player's physics looks them up by tile instead, and pickups and
+        # hazards are found the same way
+        self.wall_grid = TileGrid(rows, columns)
+        self.trigger_grid = TriggerGrid(rows, columns, [self.coin_list, self.door_opened_list, self.health_potion_list,
+                                                        self.lava_list, self.strength_potion_list, self.gun_list])
+
+        # Loads and drops the parts of a streamed level, set by build_streamed_scene
+        self.stream = None
+
+        # Renderer data for the scene, filled in by prepare_scene
+        self.sprite_layers = None
+
+    def add(self, entity, list_name):
+        """ Adds an entity to one of the scene's lists, and walls to the grids that find them """
+        getattr(self, list_name).append(entity)
+        if list_name == "wall_list":
+            self.wall_hash.insert(entity)
+            self.wall_grid.add(entity)
+
+    def remove(self, entity):
+        if self.wall_list in entity.entity_lists:
+            self.wall_hash.remove(entity)
+            self.wall_grid.remove(entity)
+        entity.remove_from_lists()
+
+    def wall_collisions(self, entity):
+        """ Returns every wall the entity overlaps, loaded or, in a streamed level, not """
+        hit_list = self.wall_hash.get_collisions(entity)
+        if self.stream is not None:
+            hit_list += self.stream.unloaded_wall_collisions(entity)
+        return hit_list
+
+    def right_limit(self):
+        """ How far right the player can go, a few tiles short of the end of the map """
+        return (self.wall_grid.columns - RIGHT_EDGE_COLUMNS) * SCALED_TILE_SIZE
+
+
+class LevelStream:
+    """
+    Loads a streamed level in chunks of STREAM_CHUNK_COLUMNS columns, read
+    from its memory-mapped map as the viewport comes near, and drops them
+    again once they fall out of a window of chunks around it. Enemies
+    belong to the chunk they spawn in and come and go with it.
+
+    The scene's lists tell the stream about every entity that leaves them.
+    Ones that leave while their chunk is loaded were killed or picked up,
+    and aren't made again when the chunk comes back; enemies that leave
+    with their chunk come back where they were, with the health they had.
+    """
+    def __init__(self, scene, map_stream, spawns, window):
+        self.scene = scene
+        self.map_stream = map_stream
+        self.window = window
+        self.chunk_count = -(-map_stream.columns // STREAM_CHUNK_COLUMNS)
+        self.chunk_range = None
+
+        # Entities made for each loaded chunk, by chunk
+        self.loaded = {}
+        # Spawns by the chunk their center is in, as (spawn number, spawn)
+        self.spawns = {}
+        for number, spawn in enumerate(spawns):
+            chunk = math.floor(spawn[3] / STREAM_CHUNK_COLUMNS)
+            self.spawns.setdefault(chunk, []).append((number, spawn))
+
+        # Entities gone for good, by the key they were made with, and the
+        # state of enemies that left with their chunk, by spawn number
+        self.gone = set()
+        self.enemy_states = {}
+        self.unloading = False
+        for list_name in LEVEL_LIST_NAMES:
+            getattr(scene, list_name).listeners.append(self)
+
+    def added(self, entity):
+        """ Entities are only kept track of as they leave """
+
+    def removed(self, entity):
+        if not self.unloading:
+            self.gone.add(entity.stream_key)
+
+    def update(self, view_left):
+        """ Loads the chunks in the window around the viewport and drops the rest """
+        chunk_width = STREAM_CHUNK_COLUMNS * SCALED_TILE_SIZE
+        first = math.floor((view_left + SCREEN_WIDTH / 2) / chunk_width) - (self.window - 1) // 2
+        first = max(min(first, self.chunk_count - self.window), 0)
+        last = min(first + self.window, self.chunk_count) - 1
+        if (first, last) == self.chunk_range:
+            return
+        self.chunk_range = (first, last)
+
+        # Drop chunks before loading any, so no more than the window is ever loaded
+        for chunk in [chunk for chunk in self.loaded if chunk < first or chunk > last]:
+            self.unload_chunk(chunk)
+        for chunk in range(first, last + 1):
+            if chunk not in self.loaded:
+                self.load_chunk(chunk)
+
+    def load_chunk(self, chunk):
+        scene = self.scene
+        entities = []
+        for number, spawn in self.spawns.get(chunk, ()):
+            key = ("enemy", number)
+            if key in self.gone:
+                continue
+            enemy, list_name = make_enemy(spawn)
+            if number in self.enemy_states:
+                enemy.center_x, enemy.center_y, enemy.change_x, enemy.enemy_health = self.enemy_states.pop(number)
+            enemy.stream_key = key
+            scene.add(enemy, list_name)
+            entities.append(enemy)
+
+        first_column = chunk * STREAM_CHUNK_COLUMNS
+        for row_index, column_index, item in self.map_stream.cells(first_column, first_column + STREAM_CHUNK_COLUMNS - 1):
+            for entity, list_name in make_tiles(row_index, column_index, item):
+                key = (list_name, row_index, column_index)
+                if key in self.gone:
+                    continue
+                entity.stream_key = key
+                scene.add(entity, list_name)
+                entities.append(entity)
+        self.loaded[chunk] = entities
+
+    def unloaded_wall_collisions(self, entity):
+        """
+        Returns the walls the entity overlaps in columns whose chunk isn't
+        loaded, made from the map just for the check. Projectiles fly on
+        out of the window, and would otherwise pass through walls that stop
+        them in a level built whole.
+        """
+        first_column = math.floor((entity.center_x + entity.box_left) / SCALED_TILE_SIZE)
+        last_column = math.floor((entity.center_x + entity.box_right) / SCALED_TILE_SIZE)
+        hit_list = []
+        for column in range(first_column, last_column + 1):
+            if column // STREAM_CHUNK_COLUMNS in self.loaded:
+                continue
+            for row_index, column_index, item in self.map_stream.cells(column, column):
+                for wall, list_name in make_tiles(row_index, column_index, item):
+                    if list_name == "wall_list" and check_for_collision(entity, wall):
+                        hit_list.append(wall)
+        return hit_list
+
+    def unload_chunk(self, chunk):
+        self.unloading = True
+        for entity in self.loaded.pop(chunk):
+            # Killed and picked up entities have already left their lists
+            if not entity.entity_lists:
+                continue
+            # Removing first lets a NumPy store hand the enemy its state back
+            self.scene.remove(entity)
+            if isinstance(entity, Enemy):
+                self.enemy_states[entity.stream_key[1]] = (entity.center_x, entity.center_y, entity.change_x,
+                                                           entity.enemy_health)
+        self.unloading = False
+
+
+class LevelPrefetcher:
+    """ Builds the next level on a worker thread while the current one is played """
+    def __init__(self, prepare_scene=None, stream_window=None):
+        self.prepare_scene = prepare_scene
+        self.stream_window = stream_window
+        self.level = None
+        self.thread = None
+        self.scene = None
+
+    def start(self, level):
+        """ Starts building a level in the background, if there is one """
+        if level not in LEVEL_MAPS:
+            return
+        self.level = level
+        self.scene = None
+        self.thread = threading.Thread(target=self.run, args=(level,), daemon=True)
+        self.thread.start()
+
+    def run(self, level):
+        self.scene = build_level(level, self.prepare_scene, self.stream_window)
+
+    def take(self, level):
+        """
+        Returns the level if it is the one being prefetched, waiting for the
+        worker if it isn't done yet. Returns None for any other level, or if
+        the worker failed.
+        """
+        if self.thread is None or self.level != level:
+            return None
+        self.thread.join()
+        scene = self.scene
+        self.level = None
+        self.thread = None
+        self.scene = None
+        return scene
+
+
+class GameSimulation:
+    """
+    Owns the player, enemies, projectiles and pickups and advances them one
+    frame per step. Nothing here needs a window: sounds to play are collected
+    in self.sounds, and the renderer reads the viewport and game over state.
+    """
+    def __init__(self, level=1, pool_size=PROJECTILE_POOL_SIZE, vectorized=False,
+                 prefetch=False, prepare_scene=None, grid_physics=False, activation_distance=None, stream_window=None,
+                 profiler=None):
+
+        # Times the parts of each step when it is turned on
+        self.profiler = profiler if profiler is not None else Profiler()
+
+        # Used for scrolling map
+        self.view_left = 0
+        self.view_bottom = 0
+        self.viewport_changed = False
+
+        # Lists. The level's own lists come with its scene, in load_level.
+        self.scene = None
+        self.scene_listeners = []
+        self.enemy_bullet_list = EntityList()
+
+        # Projectiles are recycled instead of allocated for every shot
+        self.attack_pool = ProjectilePool("sprites/invisible.png", SPRITE_SCALING, pool_size)
+        self.bullet_pool = ProjectilePool("sprites/bullet.png", SPRITE_SCALING, pool_size)
+        self.enemy_bullet_pool = ProjectilePool("sprites/bullet.png", 0.5, pool_size)
+        self.enemy_hash = DynamicHash(ENEMY_HASH_CELL_SIZE)
+
+        # PLAYER
+        self.player_list = EntityList()
+        self.player = Entity("player")
+        self.player_animation = "idle"
+        self.attack_list = EntityList()
+        self.player_attack_dmg = 1
+        self.player_faces_left = 0
+        self.bullet_list = EntityList()
+        self.bullet_amount = 0
+        self.lives = 5
+        self.score = 0
+        self.enemies_left = 0
+
+        # Cooldowns, potions and police fire run off the simulation clock
+        self.scheduler = Scheduler()
+        self.attack_cooldown = Cooldown(self.scheduler, ATTACK_COOLDOWN)
+        self.dmg_cooldown = Cooldown(self.scheduler, HURT_COOLDOWN)
+        self.potion_event = None
+        self.scheduler.schedule(POLICE_FIRE_INTERVAL, self.police_fire, POLICE_FIRE_INTERVAL)
+
+        # Sounds to play this step, and how the game ended
+        self.sounds = []
+        self.game_over = False
+        self.won = False
+
+        # Set up player
+        self.player.center_x = 4 * SCALED_TILE_SIZE
+        self.player.center_y = -7 * SCALED_TILE_SIZE
+        self.player_list.append(self.player)
+
+        # The player can find walls through the level's tile grid instead of the wall list
+        self.grid_physics = grid_physics
+
+        # Enemies further than this from the viewport can sleep. They all stay
+        # awake if it is None, or when they run on NumPy arrays.
+        self.activation_distance = activation_distance
+        self.titan_zones = None
+        self.police_zones = None
+
+        # Chunks of very wide levels kept in memory at once, or None to build every level whole
+        self.stream_window = stream_window
+
+        # Levels can be built on a worker thread before they are reached
+        self.prepare_scene = prepare_scene
+        self.prefetcher = LevelPrefetcher(prepare_scene, stream_window) if prefetch else None
+
+        # Load levels
+        self.level = level
+        self.load_level(self.level)
+
+        # Enemies and projectiles can run on NumPy arrays instead, if it is installed
+        self.vectorized = None
+        if vectorized:
+            from entity_store import VectorizedEnemies
+            self.vectorized = VectorizedEnemies(self)
+
+    def pool_stats(self):
+        """ Returns (hits, misses, free) for each projectile pool """
+        pools = {
+            "attack": self.attack_pool,
+            "bullet": self.bullet_pool,
+            "enemy_bullet": self.enemy_bullet_pool,
+        }
+        return {name: (pool.hits, pool.misses, len(pool.free)) for name, pool in pools.items()}
+
+    def state_hash(self):
+        """
+        Returns a 64-bit hash of everything that decides how the game goes on.
+        Two runs given the same input hash the same, tick for tick.
+        """
+        self.sync_entities()
+        player = self.player
+        values = [self.level, self.lives, self.score, self.bullet_amount, self.enemies_left,
+                  self.player_attack_dmg, self.player_faces_left, self.view_left, self.view_bottom,
+                  self.scheduler.time, self.attack_cooldown.ready, self.dmg_cooldown.ready,
+                  player.center_x, player.center_y, player.change_x, player.change_y]
+        for list_name in STATE_LIST_NAMES:
+            entity_list = getattr(self, list_name)
+            values.append(len(entity_list))
+            for entity in entity_list:
+                values.extend((entity.center_x, entity.center_y, entity.change_x, entity.change_y))
+        for enemy in self.titan_list.entities + self.police_list.entities:
+            values.append(enemy.enemy_health)
+        data = struct.pack(f"<{len(values)}d", *values)
+        return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little")
+
+    def sync_entities(self):
+        """ Brings entities kept in NumPy arrays up to date, for reading them between ticks """
+        if self.vectorized is not None:
+            self.vectorized.sync()
+
+    def load_level(self, level):
+        """ Swaps in a level's scene, using the prefetched copy if there is one """
+        scene = None
+        if self.prefetcher is not None:
+            scene = self.prefetcher.take(level)
+        if scene is None:
+            scene = build_level(level, self.prepare_scene, self.stream_window)
+        self.set_scene(scene)
+
+        # Get the next level ready while this one is played
+        if self.prefetcher is not None:
+            self.prefetcher.start(level + 1)
+
+    def set_scene(self, scene):
+        """
+        Replaces the current level with another in one go. The old scene is
+        dropped whole rather than emptied entity by entity, and listeners in
+        scene_listeners are told so they can drop anything they kept for it.
+        """
+        old_scene = self.scene
+        self.scene = scene
+        self.enemies_left = scene.enemies_left
+        self.wall_hash = scene.wall_hash
+        self.trigger_grid = scene.trigger_grid
+        for list_name in LEVEL_LIST_NAMES:
+            setattr(self, list_name, getattr(scene, list_name))
+
+        # Create out platformer physics engine with gravity
+        if self.grid_physics:
+            self.physics_engine = GridPhysicsEngine(self.player, scene.wall_grid, gravity_constant=GRAVITY)
+        else:
+            self.physics_engine = PhysicsEnginePlatformer(self.player, self.wall_list, gravity_constant=GRAVITY)
+
+        if self.activation_distance is not None:
+            self.titan_zones = ActivationZones(self.titan_list, self.activation_distance)
+            self.police_zones = ActivationZones(self.police_list, self.activation_distance)
+
+        for listener in self.scene_listeners:
+            listener.scene_changed(old_scene, scene)
+
+    def step(self, inputs, delta_time):
+        """
+        Applies this frame's inputs, then advances the game by one frame.
+        Inputs are tuples of ("key_press", key), ("key_release", key) with key
+        one of "W", "A" or "D", or ("mouse_press", x, y, button) with the
+        position in level coordinates and button "left" or "right".
+        """
+        self.sounds = []
+        if self.game_over:
+            return
+        for event in inputs:
+            if event[0] == "key_press":
+                self.key_press(event[1])
+            elif event[0] == "key_release":
+                self.key_release(event[1])
+            elif event[0] == "mouse_press":
+                self.mouse_press(event[1], event[2], event[3])
+        self.update(delta_time)
+
+    def awake_enemies(self):
+        """ Returns the titans and police that move and shoot this frame """
+        if self.titan_zones is None or self.vectorized is not None:
+            return self.titan_list, self.police_list
+        return self.titan_zones.update(self.view_left), self.police_zones.update(self.view_left)
+
+    def enemy_activity(self):
+        """ Returns how many enemies are awake and how many are asleep """
+        awake_titans, awake_police = self.awake_enemies()
+        active = len(awake_titans) + len(awake_police)
+        return active, len(self.titan_list) + len(self.police_list) - active
+
+    def below_level(self):
+        """ Whether the player has fallen below the map, which the game lets it do forever """
+        return self.player.top < (MAP_HEIGHT - self.scene.wall_grid.rows) * SCALED_TILE_SIZE
+
+    def police_fire(self):
+        """ Every awake police officer shoots at the player """
+        if self.vectorized is not None:
+            self.vectorized.fire()
+            return
+        awake_titans, awake_police = self.awake_enemies()
+        for police in awake_police:
+            police.shooting_update(self.player, self.enemy_bullet_list, self.enemy_bullet_pool)
+
+    def potion_ended(self):
+        """ The strength potion wears off """
+        self.player_attack_dmg = 1
+        self.potion_event = None
+
+    def update(self, delta_time):
+        """ Movement and game logic """
+        profiler = self.profiler
+        profiler.start("enemy update")
+        awake_titans, awake_police = self.awake_enemies()
+
+        # Call update on all moving entities
+        self.player_list.update()
+        self.attack_list.update()
+        if self.vectorized is None:
+            for titan in awake_titans:
+                titan.update()
+            self.bullet_list.update()
+            for police in awake_police:
+                police.update()
+            self.enemy_bullet_list.update()
+
+        # ENEMY UPDATES
+        if self.vectorized is not None:
+            self.vectorized.update()
+        else:
+            for titan in awake_titans:
+                titan.enemy_update()
+            for police in awake_police:
+                police.enemy_update()
+
+        # Run the timers that came due, now that enemies are where they shoot from
+        self.scheduler.advance(delta_time)
+
+        # If enemy touches a player, remove one life. Sleeping enemies are too far away to.
+        if self.vectorized is not None:
+            awake_titans = self.vectorized.titans.near(self.player)
+        enemy_hit_list = check_for_collision_with_list(self.player, awake_titans)
+        if self.dmg_cooldown.ready:
+            for titan in enemy_hit_list:
+                self.sounds.append("ow")
+                self.lives -= 1
+                if self.score >= 5:
+                    self.score -= 5
+                self.dmg_cooldown.restart()
+
+        # If enemy's health hits 0, remove
+        if self.vectorized is not None:
+            dead_titans, dead_police = self.vectorized.dead_enemies()
+        else:
+            dead_titans = self.titan_list
+            dead_police = self.police_list
+        for titan in dead_titans:
+            if titan.enemy_health <= 0:
+                self.sounds.append("titan_death")
+                titan.remove_from_lists()
+                self.enemies_left -= 1
+        for police in dead_police:
+            if police.enemy_health <= 0:
+                self.sounds.append("police_death")
+                police.remove_from_lists()
+                self.enemies_left -= 1
+        profiler.stop()
+
+        profiler.start("projectile collision")
+        enemy_bullet_hit_list = check_for_collision_with_list(self.player, self.enemy_bullet_list)
+
+        if self.dmg_cooldown.ready:
+            for bullet in enemy_bullet_hit_list:
+                self.sounds.append("ow")
+                self.lives -= 1
+
+                if len(enemy_bullet_hit_list) > 0:
+                    bullet.remove_from_lists()
+
+                if self.score >= 5:
+                    self.score -= 5
+                self.dmg_cooldown.restart()
+
+        for bullet in self.enemy_bullet_list:
+            enemy_bullet_wall_list = self.scene.wall_collisions(bullet)
+
+            if len(enemy_bullet_wall_list) > 0:
+                bullet.remove_from_lists()
+
+            #If the bullet flies off-screen, remove it.
+            if bullet.bottom > 0 or bullet.top < -1200 or bullet.right < 0 or bullet.left > (800 + self.view_left):
+                bullet.remove_from_lists()
+
+        profiler.stop()
+
+        # Play sound if in boss arena
+        if self.player.center_x == 37 * SCALED_TILE_SIZE and self.level == 6:
+            self.sounds.append("boss")
+
+        profiler.start("pickup collision")
+        # Everything the player touches that does something, found in one look
+        # at the tiles under it. The player doesn't move again until the physics
+        # step, so these hold for the rest of the frame.
+        triggers = self.trigger_grid.get_triggers(self.player)
+
+        # LAVA UPDATES
+        lava_hit_list = triggers["lava"]
+        if self.dmg_cooldown.ready:
+            for lava in lava_hit_list:
+                self.sounds.append("fire")
+                self.sounds.append("ow")
+                self.lives -= 1
+                if self.score >= 5:
+                    self.score -= 5
+                self.dmg_cooldown.restart()
+        profiler.stop()
+
+        profiler.start("projectile collision")
+        # Enemies move every frame, so the hash projectiles find them through is
+        # rebuilt every frame, when there are projectiles to look for them.
+        # The NumPy store finds them from its arrays instead.
+        enemy_hash = self.enemy_hash
+        if self.vectorized is not None:
+            enemy_hash = self.vectorized
+        elif len(self.attack_list) > 0 or len(self.bullet_list) > 0:
+            self.enemy_hash.rebuild([("titan", self.titan_list), ("police", self.police_list)])
+
+        # ATTACKS
+        for attack in self.attack_list:
+            # Check if attack hits an enemy
+            hits = enemy_hash.get_hits(attack)
+            attack_hit_list = hits["titan"]
+            attack_hit_list_2 = hits["police"]
+
+            # Get rid of attack
+            if len(attack_hit_list) > 0:
+                attack.remove_from_lists()
+            if len(attack_hit_list_2) > 0:
+                attack.remove_from_lists()
+            if self.attack_cooldown.ready:
+                attack.remove_from_lists()
+                self.attack_cooldown.restart()
+
+            # For every titan we hit, decrease its health
+            for titan in attack_hit_list:
+                self.sounds.append("titan_hurt")
+                titan.enemy_health -= self.player_attack_dmg
+            for police in attack_hit_list_2:
+                self.sounds.append("police_hurt")
+                police.enemy_health -= self.player_attack_dmg
+
+        for bullet in self.bullet_list:
+            # Check if bullet hits enemy
+            hits = enemy_hash.get_hits(bullet)
+            bullet_hit_list = hits["titan"]
+            bullet_hit_list_2 = hits["police"]
+            bullet_wall_list = self.scene.wall_collisions(bullet)
+
+            #For every titan we hit, decrease health
+            for titan in bullet_hit_list:
+                self.sounds.append("titan_hurt")
+                titan.enemy_health -= self.player_attack_dmg
+            for police in bullet_hit_list_2:
+                self.sounds.append("police_hurt")
+                police.enemy_health -= self.player_attack_dmg
+
+            # Get rid of attack
+            if len(bullet_hit_list) > 0:
+                bullet.remove_from_lists()
+            if len(bullet_hit_list_2) > 0:
+                bullet.remove_from_lists()
+            if len(bullet_wall_list) > 0:
+                bullet.remove_from_lists()
+
+            #If the bullet flies off-screen, remove it.
+            if bullet.bottom > 0 or bullet.top < -1200 or bullet.right < 0 or bullet.left > (800 + self.view_left):
+                bullet.remove_from_lists()
+        profiler.stop()
+
+        profiler.start("pickup collision")
+        # GUN UPDATES
+        gun_hit_list = triggers["gun"]
+        for gun in gun_hit_list:
+            gun.remove_from_lists()
+            self.sounds.append("gun")
+
+            # Add 10 bullets for every gun we touch
+            self.bullet_amount += 10
+
+        # Score count/coin collisions list
+        coin_hit_list = triggers["coin"]
+        for coin in coin_hit_list:
+            self.sounds.append("coin")
+            coin.remove_from_lists()
+            self.score += 1
+
+        # If player hits a potion, add to its stats
+        health_potion_hit_list = triggers["health_potion"]
+        for health_potion in health_potion_hit_list:
+            self.sounds.append("health")
+            health_potion.remove_from_lists()
+            self.lives += 1
+        strength_potion_hit_list = triggers["strength_potion"]
+        for strength_potion in strength_potion_hit_list:
+            self.sounds.append("strength")
+            strength_potion.remove_from_lists()
+            self.player_attack_dmg *= 2
+            # Each potion puts the end of the boost back to its full time
+            if self.potion_event is not None:
+                self.scheduler.cancel(self.potion_event)
+            self.potion_event = self.scheduler.schedule(POTION_DURATION, self.potion_ended)
+        profiler.stop()
+
+        profiler.start("level transition")
+        # Door updates
+        door_opened_hit_list = triggers["door"]
+
+        # If all enemies are gone, "open" the door.
+        if self.enemies_left == 0:
+            for door in self.door_list:
+                self.sounds.append("door")
+                door.kill()
+            if self.level <= 5:
+                # When player touches opened door
+                for door_opened in door_opened_hit_list:
+                    # Advance to next level, leaving the old scene behind
+                    self.level += 1
+                    self.sounds.append("next_level")
+                    self.load_level(self.level)
+                    self.player.center_x = 4 * SCALED_TILE_SIZE
+                    self.player.center_y = -8 * SCALED_TILE_SIZE
+
+            # The door of the last level ends the game
+            elif self.level == 6:
+                for door_opened in door_opened_hit_list:
+                    self.sounds.append("win")
+                    self.player.center_x = 216
+                    self.player.center_y = 382
+                    self.game_over = True
+                    self.won = True
+        profiler.stop()
+
+        # If player dies move to game over page
+        if self.lives <= 0:
+            self.sounds.append("game_over")
+            self.player.center_x = 216
+            self.player.center_y = 382
+            self.game_over = True
+
+        # --- Manage Scrolling ---
+        profiler.start("viewport scroll")
+        changed = False
+
+        # Scroll left
+        left_boundary = self.view_left + VIEWPORT_MARGIN
+        if self.player.left < left_boundary:
+            self.view_left -= left_boundary - self.player.left
+            changed = True
+
+        # Scroll right
+        right_boundary = self.view_left + SCREEN_WIDTH - RIGHT_MARGIN
+        if self.player.right > right_boundary:
+            self.view_left += self.player.right - right_boundary
+            changed = True
+
+        # Scroll up
+        top_boundary = self.view_bottom + SCREEN_HEIGHT - VIEWPORT_MARGIN
+        if self.player.top > top_boundary:
+            self.view_bottom += self.player.top - top_boundary
+            changed = True
+
+        # Scroll down
+        bottom_boundary = self.view_bottom + VIEWPORT_MARGIN
+        if self.player.bottom < bottom_boundary:
+            self.view_bottom -= bottom_boundary - self.player.bottom
+            changed = True
+        self.view_left = int(self.view_left)
+        self.view_bottom = int(self.view_bottom)
+
+        # Whether the view scrolled this step
+        self.viewport_changed = changed
+
+        # Restrict character from going beyond window borders
+        if self.player.center_x < 4 * SCALED_TILE_SIZE:
+            self.player.center_x = 4 * SCALED_TILE_SIZE
+        if self.player.center_x > self.scene.right_limit():
+            self.player.center_x = self.scene.right_limit()
+        profiler.stop()
+
+        # Bring in the parts of a streamed level the viewport is coming to
+        if self.scene.stream is not None:
+            profiler.start("level streaming")
+            self.scene.stream.update(self.view_left)
+            profiler.stop()
+
+        # Update physics engine
+        profiler.start("physics")
+        self.physics_engine.update()
+        profiler.stop()
+
+    def mouse_press(self, x, y, button):
+        """ Attacks towards a point in the level """
+        # LEFT BUTTON PRESSED: ATTACK
+        if button == "left":
+            # Position the attack at the player's current location
+            attack = self.attack_pool.acquire()
+            self.sounds.append("attack")
+            start_y = self.player.center_y
+            if self.player_faces_left == 1:
+                start_x = self.player.center_x - 60
+            elif self.player_faces_left == 0:
+                start_x = self.player.center_x + 60
+            attack.center_x = start_x
+            attack.center_y = start_y
+
+            # Do math to calculate how to get the attack to the destination.
+            # Calculation the angle in radians between the start points
+            # and end points.
+            x_diff = x - start_x
+            y_diff = y - start_y
+            angle = math.atan2(y_diff, x_diff)
+            attack.angle = math.degrees(angle)
+
+            # Add the attack to the appropriate lists
+            self.attack_list.append(attack)
+
+        # RIGHT BUTTON PRESSED: BULLET
+        if self.bullet_amount >= 1:
+            if button == "right":
+                bullet = self.bullet_pool.acquire()
+                self.sounds.append("pew")
+                bullet.center_x = self.player.center_x
+                bullet.center_y = self.player.center_y
+                x_diff = x - bullet.center_x
+                y_diff = y - bullet.center_y
+                angle = math.atan2(y_diff, x_diff)
+                bullet.angle = math.degrees(angle)
+                bullet.change_x = math.cos(angle) * 5
+                bullet.change_y = math.sin(angle) * 5
+                self.bullet_list.append(bullet)
+                self.bullet_amount -= 1
+                self.attack_cooldown.restart()
+
+    def key_press(self, key):
+        """ Allows user to control player WASD """
+        if key == "W":
+            if self.physics_engine.can_jump():
+                self.sounds.append("jump")
+                self.player.change_y = JUMP_SPEED
+                self.player_animation = "idle"
+        elif key == "A":
+            self.player.change_x = -MOVEMENT_SPEED
+            self.player_animation = "walk_left"
+        elif key == "D":
+            self.player.change_x = MOVEMENT_SPEED
+            self.player_animation = "walk_right"
+
+    def key_release(self, key):
+        """ Stops the player when a movement key is let go """
+        if key == "A" or key == "D":
+            self.player.change_x = 0
+            self.player_animation = "idle"
+        if key == "A":
+            self.player_faces_left = 1
+        elif key == "D":
+            self.player_faces_left = 0
@@ -0,0 +1,54 @@
+# Titan Slayer
+# Checks that the faster ways of running the game play it the same way
+
+import importlib.util
+import random
+import unittest
+
+from benchmark import scripted_inputs
+from levels import LEVEL_MAPS
+from simulation import TICK_LENGTH, GameSimulation
+
+# Ticks each level is played for
+TICKS = 1200
+
+# A random enemy is killed every this many ticks, so removals are covered too
+KILL_INTERVAL = 100
+
+
+def first_difference(level, settings, other_settings, ticks=TICKS):
+    """
+    Plays a level with both settings and the same scripted input. Returns
+    the first tick the two games' state hashes differ on, or None.
+    """
+    simulations = [GameSimulation(level, **settings), GameSimulation(level, **other_settings)]
+    rng = random.Random(level)
+    for tick in range(ticks):
+        if tick % KILL_INTERVAL == KILL_INTERVAL // 2:
+            enemies = simulations[0].titan_list.entities + simulations[0].police_list.entities
+            if enemies:
+                index = rng.randrange(len(enemies))
+                for simulation in simulations:
+                    (simulation.titan_list.entities + simulation.police_list.entities)[index].enemy_health = 0
+        for simulation in simulations:
+            simulation.step(scripted_inputs(simulation, tick), TICK_LENGTH)
+        if simulations[0].state_hash() != simulations[1].state_hash():
+            return tick
+    return None
+
+
+class EquivalenceTest(unittest.TestCase):
+    def test_grid_physics_plays_like_list_physics(self):
+        for level in sorted(LEVEL_MAPS):
+            with self.subTest(level=level):
+                self.assertIsNone(first_difference(level, {}, {"grid_physics": True}))
+
+    @unittest.skipUnless(importlib.util.find_spec("numpy"), "the vectorized mode needs NumPy")
+    def test_vectorized_plays_like_scalar(self):
+        for level in sorted(LEVEL_MAPS):
+            with self.subTest(level=level):
+                self.assertIsNone(first_difference(level, {}, {"vectorized": True}))
+
+
+if __name__ == "__main__":
+    unittest.main()